@@ -10,6 +10,9 @@ scope = [
 
 service_account_file_path = os.path.join(os.path.dirname(__file__), 'service-account.json')
 
+# The orders report spreadsheet
+SPREADSHEET_ID = os.getenv('GOOGLE_SHEETS_SPREADSHEET_ID')
+
 credentials = ServiceAccountCredentials.from_json_keyfile_name(
     service_account_file_path, scope
 )
@@ -43,6 +46,25 @@ def write_to_sheet(range, data):
     )
 
 
+def append_to_sheet(range, data):
+    # Rows are added after the last non-empty row of the table in `range`
+    client = get_google_sheets_client()
+    spreadsheet = client.open_by_key(SPREADSHEET_ID)
+
+    return spreadsheet.values_append(
+        range,
+        params={'valueInputOption': 'RAW', 'insertDataOption': 'INSERT_ROWS'},
+        body={'values': data}
+    )
+
+
+def clear_sheet(range):
+    client = get_google_sheets_client()
+    spreadsheet = client.open_by_key(SPREADSHEET_ID)
+
+    return spreadsheet.values_clear(range)
+
+
 def bulk_write_to_sheet(sheet_id, data):
     client = get_google_sheets_client()
     spreadsheet = client.open_by_key(sheet_id)
@@ -59,4 +81,3 @@ def bulk_write_to_sheet(sheet_id, data):
         })
 
     return sheet.batch_update(request_data)
-
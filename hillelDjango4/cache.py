@@ -0,0 +1,200 @@
+import logging
+import math
+import pickle
+import random
+import threading
+import time
+import uuid
+
+from django.core.cache import cache
+from django.db import connection, connections
+
+logger = logging.getLogger(__name__)
+
+# Namespaces are invalidated by bumping their version instead of deleting keys.
+# Entries built with an old version are never read again and expire by TTL.
+VERSION_TIMEOUT = None  # never expire version counters
+
+
+def version_key(namespace):
+    return f'version:{namespace}'
+
+
+def modified_key(namespace):
+    return f'modified:{namespace}'
+
+
+def get_versions(*namespaces):
+    keys = {version_key(namespace): namespace for namespace in namespaces}
+    versions = cache.get_many(keys.keys())
+
+    for key, namespace in keys.items():
+        if key not in versions:
+            # Start from the current time so a counter lost from the cache
+            # never goes back to a version that was already used
+            cache.add(key, int(time.time() * 1000), timeout=VERSION_TIMEOUT)
+            versions[key] = cache.get(key)
+
+    return {namespace: versions[key] for key, namespace in keys.items()}
+
+
+def get_version(namespace):
+    return get_versions(namespace)[namespace]
+
+
+def bump_version(*namespaces):
+    for namespace in namespaces:
+        try:
+            cache.incr(version_key(namespace))
+        except ValueError:
+            # Not initialized yet - nothing could have been cached with it
+            get_version(namespace)
+
+    # For Last-Modified (see hillelDjango4/conditional.py)
+    now = time.time()
+    cache.set_many({modified_key(namespace): now for namespace in namespaces}, timeout=VERSION_TIMEOUT)
+
+
+def get_last_modified(*namespaces):
+    """Unix time of the latest bump of any of the namespaces"""
+    keys = [modified_key(namespace) for namespace in namespaces]
+    modified = cache.get_many(keys)
+
+    for key in keys:
+        if key not in modified:
+            # Unknown - assume it changed now, like a new version
+            cache.add(key, time.time(), timeout=VERSION_TIMEOUT)
+            modified[key] = cache.get(key)
+
+    return max(modified.values())
+
+
+def bumped_since(since, *namespaces):
+    """
+    Whether any of the namespaces was bumped at or after `since` (unix time), e.g. while data was built.
+    Never bumped namespaces have no modified time and count as unchanged.
+    """
+    modified = cache.get_many([modified_key(namespace) for namespace in namespaces])
+
+    return any(value >= since for value in modified.values())
+
+
+def versioned_key(key, *namespaces):
+    """Cache key that changes whenever any of the namespaces is bumped"""
+    versions = get_versions(*namespaces)
+
+    return key + ':' + ':'.join(f'{namespace}@{versions[namespace]}' for namespace in namespaces)
+
+
+LOCK_TIMEOUT = 30  # longest expected compute() time
+WAIT_TIMEOUT = 5  # how long a cold miss waits for the worker holding the lock
+
+
+def lock_key(key):
+    return f'lock:{key}'
+
+
+def acquire_lock(key, timeout=LOCK_TIMEOUT):
+    """A token if the lock was free (cache.add - SET NX on Redis), None if it is held"""
+    token = str(uuid.uuid4())
+    if cache.add(lock_key(key), token, timeout=timeout):
+        return token
+    return None
+
+
+def release_lock(key, token):
+    # Only our own lock: after LOCK_TIMEOUT it may have expired and been taken by another worker.
+    # get + delete isn't atomic, but the window is tiny compared to the timeout that caused it
+    if cache.get(lock_key(key)) == token:
+        cache.delete(lock_key(key))
+
+
+def get_or_compute(key, compute, timeout, namespaces=(), stale_timeout=None, beta=1.0, stale_on_bump=True,
+                   max_size=None, background=True):
+    """
+    Cached compute() result, recomputed by one worker at a time.
+
+    The entry keeps the namespace versions it was built with. After `timeout` seconds or a bump of
+    any namespace it is stale: the worker that takes the lock (cache.add - SET NX on Redis)
+    recomputes it, in a background thread, while everybody keeps getting the stale value
+    for up to `stale_timeout` more seconds. With stale_on_bump=False a bumped entry is never served:
+    it is rebuilt like a missing one.
+
+    Probabilistic early expiration (XFetch): before `timeout`, an entry is refreshed ahead of time
+    with a probability growing as expiry approaches and with how long compute() took (`beta` > 1
+    refreshes earlier), so hot keys rarely go stale at all.
+
+    Values bigger than `max_size` bytes (pickled) are returned but not cached.
+
+    A background refresh runs after the response was returned: compute() must not use the request
+    (or the view). Pass background=False for those, the worker holding the lock then refreshes inline.
+    """
+    stale_timeout = timeout if stale_timeout is None else stale_timeout
+    versions = get_versions(*namespaces)
+
+    entry = cache.get(key)
+    if entry is not None and not stale_on_bump and entry[1] != versions:
+        entry = None
+
+    if entry is not None:
+        value, entry_versions, expires_at, delta = entry
+
+        # 1 - random() is in (0, 1]: -log() is >= 0
+        early = -delta * beta * math.log(1 - random.random())
+        if entry_versions == versions and time.time() + early < expires_at:
+            return value
+
+        token = acquire_lock(key)
+        if token is not None:
+            # Another thread wouldn't see the uncommitted changes
+            if not background or connection.in_atomic_block:
+                return _compute(key, compute, timeout, stale_timeout, versions, max_size, token)
+            _compute_in_background(key, compute, timeout, stale_timeout, versions, max_size, token)
+
+        return value
+
+    token = acquire_lock(key)
+    if token is not None:
+        return _compute(key, compute, timeout, stale_timeout, versions, max_size, token)
+
+    # Cold miss while another worker computes: wait for its result instead of running the same query
+    deadline = time.monotonic() + WAIT_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        entry = cache.get(key)
+        if entry is not None and entry[1] == versions:
+            return entry[0]
+
+    return compute()
+
+
+def _compute(key, compute, timeout, stale_timeout, versions, max_size, token):
+    # versions were read before compute(): a bump during it leaves the entry stale, not wrong
+    try:
+        start = time.monotonic()
+        value = compute()
+        delta = time.monotonic() - start
+
+        if max_size is not None and len(pickle.dumps(value)) > max_size:
+            logger.warning('Not caching %s: bigger than %s bytes', key, max_size)
+            # An older entry would otherwise keep being served stale
+            cache.delete(key)
+            return value
+
+        cache.set(key, (value, versions, time.time() + timeout, delta), timeout=timeout + stale_timeout)
+        return value
+    finally:
+        release_lock(key, token)
+
+
+def _compute_in_background(*args):
+    def refresh():
+        try:
+            _compute(*args)
+        except Exception:
+            logger.exception('Refreshing cache key %s failed', args[0])
+        finally:
+            # The thread's own database connections
+            connections.close_all()
+
+    threading.Thread(target=refresh, daemon=True).start()
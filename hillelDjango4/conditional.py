@@ -0,0 +1,48 @@
+from hashlib import md5
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from hillelDjango4.cache import get_last_modified, get_versions
+
+
+class ConditionalGetMixin:
+    """
+    ETag / Last-Modified for viewset actions, built from cache namespace versions
+    (see hillelDjango4/cache.py): the same bumps that invalidate cached data change the validators.
+
+        not_modified = self.check_not_modified(request, 'products')
+        if not_modified:
+            return not_modified
+
+    returns 304 before anything is queried or serialized.
+    """
+
+    def check_not_modified(self, request, *namespaces, extra=None, modified_at=None):
+        versions = get_versions(*namespaces)
+        last_modified = get_last_modified(*namespaces)
+        if modified_at is not None:
+            last_modified = max(last_modified, modified_at)
+
+        # Same URL, but different users, renderers (JSON / browsable API) or data versions
+        etag = md5('|'.join([
+            request.get_full_path(),
+            request.META.get('HTTP_ACCEPT', ''),
+            str(request.user.pk),
+            *[f'{namespace}@{version}' for namespace, version in versions.items()],
+            str(extra),
+        ]).encode()).hexdigest()
+
+        self.validators = quote_etag(etag), int(last_modified)
+
+        return get_conditional_response(request, etag=self.validators[0], last_modified=self.validators[1])
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+
+        validators = getattr(self, 'validators', None)
+        if validators and response.status_code in (200, 304):
+            response['ETag'], last_modified = validators
+            response['Last-Modified'] = http_date(last_modified)
+
+        return response
@@ -0,0 +1,63 @@
+from functools import reduce
+from operator import or_
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, Q, Value, When
+
+
+def increment_many(model, deltas):
+    """
+    Add deltas to counter rows, creating the missing ones.
+    deltas: {((lookup field, value), ...): {field: delta}}.
+    One UPDATE for all the rows, only new rows need a SELECT and an INSERT.
+    """
+    deltas = {key: values for key, values in deltas.items() if any(values.values())}
+    if not deltas:
+        return
+
+    fields = sorted({field for values in deltas.values() for field, delta in values.items() if delta})
+    rows = reduce(or_, [Q(*key) for key in deltas])
+    updated = model.objects.filter(rows).update(**{
+        field: F(field) + Case(
+            *[When(Q(*key), then=Value(values[field])) for key, values in deltas.items() if values.get(field)],
+            default=Value(0),
+            output_field=model._meta.get_field(field),
+        )
+        for field in fields
+    })
+    if updated == len(deltas):
+        return
+
+    # Rows seen for the first time
+    key_fields = [name for name, _ in next(iter(deltas))]
+    existing = set(model.objects.filter(rows).values_list(*key_fields))
+    missing = {
+        key: values for key, values in deltas.items()
+        if tuple(value for _, value in key) not in existing and all(delta >= 0 for delta in values.values())
+    }
+    try:
+        with transaction.atomic():
+            model.objects.bulk_create([model(**dict(key), **values) for key, values in missing.items()])
+    except IntegrityError:
+        # Some were created concurrently - one by one
+        for key, values in missing.items():
+            increment(model.objects.filter(*key), values, **dict(key))
+
+
+def increment(queryset, values, **lookup):
+    """Add {field: delta} to the rows of the queryset, or create the row from lookup"""
+    values = {field: delta for field, delta in values.items() if delta}
+    if not values:
+        return
+
+    if queryset.update(**{field: F(field) + delta for field, delta in values.items()}):
+        return
+    if any(delta < 0 for delta in values.values()):
+        return
+
+    try:
+        with transaction.atomic():
+            queryset.model.objects.create(**lookup, **values)
+    except IntegrityError:
+        # Created concurrently - just increment it
+        queryset.update(**{field: F(field) + delta for field, delta in values.items()})
@@ -0,0 +1,75 @@
+import json
+import uuid
+from hashlib import md5
+
+from celery import Task
+from django.core.cache import cache
+
+from hillelDjango4.cache import acquire_lock, release_lock
+
+
+class CoalescedTask(Task):
+    """
+    Base for tasks where one run covers every call made before it starts (reports, rebuilds).
+
+        @app.task(bind=True, base=CoalescedTask, coalesce_window=5)
+        def update_report(self): ...
+
+        update_report.debounce()
+
+    debounce() queues a run `coalesce_window` seconds later unless one with the same arguments
+    is already pending (cache.add - SET NX on Redis), so a burst of calls queues a single run.
+    A running lock keeps one run of the task at a time, whatever its arguments (tasks writing
+    the same data can share one with lock_key): a run that finds it taken is queued again instead.
+    The pending marker is cleared when a run starts, so calls made while it works queue
+    one more run that picks up their changes.
+    """
+    coalesce_window = 5
+    # Longest expected run, the running lock expires after it if a worker dies
+    running_timeout = 10 * 60
+    # Tasks with the same lock_key never run at the same time, by default it's one lock per task
+    lock_key = None
+
+    def running_key(self):
+        return self.lock_key or f'task:{self.name}'
+
+    def coalesce_key(self, args, kwargs):
+        digest = md5(json.dumps([args, kwargs], sort_keys=True, default=str).encode()).hexdigest()
+
+        return f'task:{self.name}:{digest}'
+
+    def debounce(self, *args, **kwargs):
+        return self._queue(self.coalesce_key(args, kwargs), args, kwargs)
+
+    def _queue(self, key, args, kwargs, replace=False):
+        # The pending run is identified by its task id
+        task_id = str(uuid.uuid4())
+        timeout = self.coalesce_window + self.running_timeout
+
+        if replace:
+            cache.set(f'{key}:pending', task_id, timeout=timeout)
+        elif not cache.add(f'{key}:pending', task_id, timeout=timeout):
+            return None
+
+        return self.apply_async(args, kwargs, task_id=task_id, countdown=self.coalesce_window)
+
+    def __call__(self, *args, **kwargs):
+        key = self.coalesce_key(args, kwargs)
+        pending = cache.get(f'{key}:pending')
+
+        token = acquire_lock(self.running_key(), timeout=self.running_timeout)
+        if token is None:
+            # Another run is in progress: make sure one run follows it
+            if pending is None or pending == self.request.id:
+                self._queue(key, args, kwargs, replace=True)
+            return None
+
+        try:
+            # Calls from now on queue a new run: this one may have read the data before their changes
+            if pending == self.request.id:
+                cache.delete(f'{key}:pending')
+
+            return super().__call__(*args, **kwargs)
+        finally:
+            # Not a lock that expired during a long run and was taken by the next one
+            release_lock(self.running_key(), token)
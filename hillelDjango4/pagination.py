@@ -1,7 +1,20 @@
-from datetime import datetime
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import date, datetime, time
+from decimal import Decimal
+from uuid import UUID
 
-from rest_framework.pagination import CursorPagination
+from django.core.exceptions import FieldDoesNotExist
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.encoding import force_str
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, CursorPagination
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
 
 
 class CustomCursorPagination(CursorPagination):
@@ -15,3 +28,226 @@ class CustomCursorPagination(CursorPagination):
             **super_response,
             'now': str(datetime.now())
         })
+
+
+def estimate_count(queryset, exact_below=10000):
+    """
+    Row count from the PostgreSQL planner (EXPLAIN, no scan) instead of COUNT(*).
+    Small results, and other databases, get an exact count.
+    """
+    queryset = queryset.order_by()
+    connection = connections[queryset.db]
+
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+
+    estimate = plan[0]['Plan']['Plan Rows']
+    if estimate < exact_below:
+        return queryset.count()
+
+    return estimate
+
+
+class EstimatedCountPaginator(Paginator):
+    """Django paginator (admin changelists) counting with estimate_count()"""
+    exact_count_below = 10000
+
+    @cached_property
+    def count(self):
+        return estimate_count(self.object_list, exact_below=self.exact_count_below)
+
+
+def _cursor_value(value):
+    # Full precision: DjangoJSONEncoder would cut datetimes to milliseconds
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, (Decimal, UUID)):
+        return str(value)
+    return value
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset ("seek") pagination: the cursor holds the ordering values of the last row and the
+    next page is WHERE (ordering) > (cursor values) ... LIMIT, so deep pages cost the same as page 1.
+
+    The ordering is the one of the queryset (OrderingFilter, search rank), else view.ordering,
+    else `ordering`. The primary key is added as a tiebreaker unless a unique field already
+    makes the ordering total. Ordering fields must not be NULL.
+
+    ?count=estimate (default) | exact | none - see estimate_count()
+    """
+    page_size = api_settings.PAGE_SIZE
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    ordering = ('pk',)
+    exact_count_below = 10000
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.fields = self.get_ordering(queryset, view)
+        self.count = self.get_count(queryset, request)
+
+        reverse, values = self.decode_cursor(request)
+        if values is not None:
+            queryset = queryset.filter(self.seek(values, reverse))
+
+        queryset = queryset.order_by(*[
+            f'-{name}' if descending != reverse else name for name, descending in self.fields
+        ])
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        self.next_values = self.previous_values = None
+        if rows:
+            # Going back, the page we came from is still ahead
+            if has_more or reverse:
+                self.next_values = self.get_key(rows[-1])
+            if (has_more and reverse) or (values is not None and not reverse):
+                self.previous_values = self.get_key(rows[0])
+
+        return rows
+
+    def get_ordering(self, queryset, view):
+        """[(attname, descending)] with a tiebreaker making the order total"""
+        model = queryset.model
+        ordering = list(queryset.query.order_by) or list(
+            getattr(view, 'ordering', None) or model._meta.ordering or self.ordering
+        )
+
+        fields = []
+        for name in ordering:
+            assert isinstance(name, str), 'KeysetPagination supports field names only'
+            descending = name.startswith('-')
+            name = name.lstrip('-')
+            if name == 'pk':
+                name = model._meta.pk.attname
+            fields.append((name, descending))
+
+        if not any(self.is_unique(model, name) for name, _ in fields):
+            fields.append((model._meta.pk.attname, fields[-1][1]))
+
+        return fields
+
+    def is_unique(self, model, name):
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            # Annotation or related lookup
+            return False
+
+        return field.unique
+
+    def seek(self, values, reverse):
+        """
+        (f1, f2, ...) > (v1, v2, ...) as f1 >= v1 AND (f1 > v1 OR (f1 = v1 AND f2 > v2) ...).
+        The redundant leading bound lets the database start the index scan at the cursor.
+        """
+        condition = None
+        for (name, descending), value in reversed(list(zip(self.fields, values))):
+            lookup = 'lt' if descending != reverse else 'gt'
+            after = Q(**{f'{name}__{lookup}': value})
+            condition = after if condition is None else after | (Q(**{name: value}) & condition)
+
+        name, descending = self.fields[0]
+        lookup = 'lte' if descending != reverse else 'gte'
+
+        return Q(**{f'{name}__{lookup}': values[0]}) & condition
+
+    def get_key(self, row):
+        # .values() dicts or model instances
+        if isinstance(row, dict):
+            return [_cursor_value(row[name]) for name, _ in self.fields]
+
+        return [_cursor_value(getattr(row, name)) for name, _ in self.fields]
+
+    def get_count(self, queryset, request):
+        mode = request.query_params.get(self.count_query_param, 'estimate')
+
+        if mode == 'none':
+            return None
+        if mode == 'exact':
+            return queryset.order_by().count()
+
+        return estimate_count(queryset, exact_below=self.exact_count_below)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return False, None
+
+        try:
+            reverse, values = json.loads(urlsafe_b64decode(encoded.encode()))
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+        if not isinstance(values, list) or len(values) != len(self.fields):
+            raise NotFound(self.invalid_cursor_message)
+
+        return bool(reverse), values
+
+    def encode_cursor(self, values, reverse):
+        encoded = urlsafe_b64encode(json.dumps([reverse, values]).encode())
+        return replace_query_param(self.base_url, self.cursor_query_param, force_str(encoded))
+
+    def get_next_link(self):
+        if self.next_values is None:
+            return None
+        return self.encode_cursor(self.next_values, reverse=False)
+
+    def get_previous_link(self):
+        if self.previous_values is None:
+            return None
+        return self.encode_cursor(self.previous_values, reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'count': self.count,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['count', 'results'],
+            'properties': {
+                'count': {'type': 'integer', 'nullable': True},
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'The pagination cursor value.',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.count_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'estimate (default), exact or none.',
+                'schema': {'type': 'string', 'enum': ['estimate', 'exact', 'none']},
+            },
+        ]
@@ -0,0 +1,97 @@
+from functools import lru_cache
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+
+
+def get_representation_serializer(serializer):
+    """
+    The serializer that renders the output: the child of many=True fields, or the
+    representation_serializer_class of a serializer whose to_representation() delegates to another one.
+    """
+    serializer = getattr(serializer, 'child', serializer)
+
+    representation_class = getattr(serializer, 'representation_serializer_class', None)
+    if representation_class is not None:
+        return representation_class()
+
+    return serializer
+
+
+def get_prefetch_plan(serializer, model, prefix=''):
+    """
+    select_related / prefetch_related lookups for the relations a serializer renders, nested serializers included.
+
+    Forward foreign keys rendered by a nested serializer are joined (select_related),
+    to-many relations get one query each (Prefetch, with the plan of their own serializer).
+    """
+    select_related = []
+    prefetch_related = []
+
+    for field in get_representation_serializer(serializer).fields.values():
+        if field.write_only or field.source == '*':
+            continue
+
+        # Only the model fields along dotted sources (user.email), methods and properties are skipped
+        related_model = model
+        path = []
+        for name in field.source.split('.'):
+            try:
+                model_field = related_model._meta.get_field(name)
+            except FieldDoesNotExist:
+                break
+            if not model_field.is_relation:
+                break
+            path.append(model_field)
+            related_model = model_field.related_model
+        if not path:
+            continue
+
+        lookup = prefix + '__'.join(model_field.name for model_field in path)
+        model_field = path[-1]
+        nested = isinstance(field, serializers.BaseSerializer)
+
+        if model_field.many_to_many or model_field.one_to_many:
+            queryset = related_model._default_manager.all()
+            if nested:
+                nested_select, nested_prefetch = get_prefetch_plan(field, related_model)
+                queryset = queryset.select_related(*nested_select).prefetch_related(*nested_prefetch)
+            prefetch_related.append(Prefetch(lookup, queryset=queryset))
+        elif nested:
+            select_related.append(lookup)
+
+            nested_select, nested_prefetch = get_prefetch_plan(field, related_model, prefix=f'{lookup}__')
+            select_related += nested_select
+            prefetch_related += nested_prefetch
+        elif not isinstance(field, serializers.PrimaryKeyRelatedField) or len(path) > 1:
+            # Primary keys of forward relations are read from the row itself (product_id)
+            select_related.append(lookup)
+
+    return select_related, prefetch_related
+
+
+@lru_cache
+def get_serializer_prefetch_plan(serializer_class, model):
+    return get_prefetch_plan(serializer_class(), model)
+
+
+def prefetch_for_serializer(queryset, serializer_class):
+    select_related, prefetch_related = get_serializer_prefetch_plan(serializer_class, queryset.model)
+
+    if select_related:
+        queryset = queryset.select_related(*select_related)
+    if prefetch_related:
+        queryset = queryset.prefetch_related(*prefetch_related)
+
+    return queryset
+
+
+class PrefetchPlanMixin:
+    """
+    Loads everything get_serializer_class() renders with a fixed number of queries:
+    the select_related / prefetch_related plan is derived from the serializer tree.
+    """
+
+    def get_queryset(self):
+        return prefetch_for_serializer(super().get_queryset(), self.get_serializer_class())
@@ -0,0 +1,158 @@
+import time
+from hashlib import md5
+from urllib.parse import parse_qs, urlsplit
+
+from django.core.cache import cache
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from hillelDjango4.cache import bumped_since, get_versions
+
+RESPONSE_CACHE_TIMEOUT = 60 * 60
+
+
+def normalize_query(query_params, allowed=None, defaults=None, lists=()):
+    """
+    Canonical query string: known parameters only, sorted, without empty or default values.
+    `lists` are comma-separated parameters whose items are sorted too (tags=Sale,New == tags=new,sale).
+    """
+    defaults = defaults or {}
+    items = []
+
+    for name in sorted(query_params):
+        if allowed is not None and name not in allowed:
+            continue
+
+        for value in sorted(query_params.getlist(name)):
+            value = ' '.join(value.split())
+            if name in lists:
+                value = ','.join(sorted({item.strip().lower() for item in value.split(',') if item.strip()}))
+            if value and value != defaults.get(name):
+                items.append(f'{name}={value}')
+
+    return '&'.join(items)
+
+
+def stats_key(endpoint, result):
+    return f'response_cache:{endpoint}:{result}'
+
+
+def record_request(endpoint, hit):
+    key = stats_key(endpoint, 'hits' if hit else 'misses')
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, timeout=None)
+
+
+def get_stats(endpoint):
+    counters = cache.get_many([stats_key(endpoint, 'hits'), stats_key(endpoint, 'misses')])
+    hits = counters.get(stats_key(endpoint, 'hits'), 0)
+    misses = counters.get(stats_key(endpoint, 'misses'), 0)
+
+    return {
+        'hits': hits,
+        'misses': misses,
+        'ratio': hits / (hits + misses) if hits + misses else None,
+    }
+
+
+def reset_stats(endpoint):
+    cache.delete_many([stats_key(endpoint, 'hits'), stats_key(endpoint, 'misses')])
+
+
+class ResponseCacheMixin:
+    """
+    Caches response data per endpoint and normalized query.
+
+    Each entry stores the versions of the namespaces ("tags") it depends on, e.g. the products
+    it shows (see hillelDjango4/cache.py). It is served only while none of them was bumped,
+    so a change evicts just the entries tagged with what changed.
+    """
+    response_cache_timeout = RESPONSE_CACHE_TIMEOUT
+    # For cachestats, the actions using cached_response()
+    response_cache_actions = ()
+    # Query parameters that change the response, None - all of them
+    response_cache_params = None
+    response_cache_defaults = {}
+    response_cache_lists = ()
+
+    def get_cache_endpoint(self, action):
+        # E.g. product-list, product-retrieve
+        return f'{self.basename}-{action}'
+
+    def get_response_cache_key(self, request):
+        query = normalize_query(
+            request.query_params,
+            allowed=self.response_cache_params,
+            defaults=self.response_cache_defaults,
+            lists=self.response_cache_lists,
+        )
+        digest = md5(f'{request.path}?{query}'.encode()).hexdigest()
+
+        return f'response:{self.get_cache_endpoint(self.action)}:{digest}'
+
+    def cached_response(self, request, build):
+        """
+        build() returns (data, tags). Only the data of successful responses is cached,
+        exceptions (404, validation errors) pass through.
+        """
+        endpoint = self.get_cache_endpoint(self.action)
+        key = self.get_response_cache_key(request)
+
+        entry = cache.get(key)
+        if entry is not None:
+            data, versions = entry
+            if get_versions(*versions) == versions:
+                record_request(endpoint, hit=True)
+                return Response(self.add_page_links(data))
+
+        record_request(endpoint, hit=False)
+        started = time.time()
+        data, tags = build()
+        data = self.strip_page_links(data)
+
+        # The tags are known only after build(): a bump during it would store old data under the new versions
+        versions = get_versions(*tags)
+        if not bumped_since(started, *tags):
+            cache.set(key, (data, versions), timeout=self.response_cache_timeout)
+
+        return Response(self.add_page_links(data))
+
+    @property
+    def cursor_query_param(self):
+        return getattr(self.paginator, 'cursor_query_param', 'cursor')
+
+    def strip_page_links(self, data):
+        """
+        Paginated data is cached with just the cursors of next / previous:
+        the links are built for each request (host, parameters as sent) by add_page_links()
+        """
+        if not isinstance(data, dict) or 'next' not in data:
+            return data
+
+        links = {}
+        for name in ('next', 'previous'):
+            cursor = None
+            if data.get(name):
+                cursor = parse_qs(urlsplit(data[name]).query).get(self.cursor_query_param, [''])[0]
+            links[name] = cursor
+
+        return {**data, **links}
+
+    def add_page_links(self, data):
+        if not isinstance(data, dict) or 'next' not in data:
+            return data
+
+        url = self.request.build_absolute_uri()
+        links = {}
+        for name in ('next', 'previous'):
+            if data.get(name) is None:
+                links[name] = None
+            elif data[name]:
+                links[name] = replace_query_param(url, self.cursor_query_param, data[name])
+            else:
+                # The first page
+                links[name] = remove_query_param(url, self.cursor_query_param)
+
+        return {**data, **links}
@@ -35,7 +35,7 @@ class OrderObjectType(DjangoObjectType):
 
     class Meta:
         model = Order
-        fields = ('uuid', 'user', 'total_price', 'created_at', 'updated_at', 'order_products')
+        fields = ('uuid', 'user', 'total_quantity', 'total_price', 'created_at', 'updated_at', 'order_products')
 
 
 class Query(graphene.ObjectType):
@@ -92,20 +92,9 @@ class CreateOrder(graphene.Mutation):
         if len(products) != len(order_products):
             raise GraphQLError('Some products do not exist')
 
-        order = Order.objects.create(user=info.context.user)
-
-        order_products_instances = [
-            OrderProduct(
-                order=order,
-                product=products[int(op.product_id)],
-                quantity=op.quantity,
-                price=products[int(op.product_id)].price * op.quantity,
-            )
-            for op in order_products
-        ]
-
-        OrderProduct.objects.bulk_create(order_products_instances)
-        order.update_total_price()
+        order = Order.objects.create_with_products(info.context.user, [
+            (products[int(op.product_id)], op.quantity) for op in order_products
+        ])
 
         # Bad way (SQL queries in a loop)
         # for order_product in order_products:
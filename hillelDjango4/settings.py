@@ -46,6 +46,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     # Installed third-party apps
     'rest_framework',
     'rest_framework.authtoken',
@@ -190,7 +191,8 @@ REST_FRAMEWORK = {
         'rest_framework.authentication.TokenAuthentication',
         # 'hillelDjango4.authorization.HalsoAuthentication',
     ],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    # Keyset pagination: deep pages cost the same as the first one
+    'DEFAULT_PAGINATION_CLASS': 'hillelDjango4.pagination.KeysetPagination',
     'PAGE_SIZE': 10,
     'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend'],
 }
@@ -282,6 +284,28 @@ GRAPHENE = {
 }
 
 
+# Product images
+# Variants are generated by products.tasks.process_product_image after upload
+PRODUCT_IMAGE_VARIANTS = {
+    'thumb': (200, 200),
+    'medium': (600, 600),
+    'large': (1200, 1200),
+}
+# file extension -> PIL format
+PRODUCT_IMAGE_FORMATS = {
+    'webp': 'WEBP',
+    'jpg': 'JPEG',
+}
+PRODUCT_IMAGE_QUALITY = 85
+# Served until the variants are ready
+PRODUCT_IMAGE_PLACEHOLDER = os.getenv('PRODUCT_IMAGE_PLACEHOLDER', 'https://placehold.co/600x600?text=No+image')
+
+
+# Product search
+# Without PostgreSQL, search uses an in-process inverted index (products/search.py)
+SEARCH_FALLBACK_MAX_RESULTS = 1000
+
+
 # Log all SQL queries
 LOGGING = {
     'version': 1,
@@ -0,0 +1,95 @@
+from copy import deepcopy
+
+from django.db.models.fields.files import FieldFile
+
+
+class ChangeTrackingMixin:
+    """
+    Remembers field values as loaded from the database.
+
+    has_changed() / changed_fields / previous_value() work without querying the database,
+    and save() writes only the changed columns (update_fields) unless
+    update_changed_fields_only is False.
+    """
+    update_changed_fields_only = True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = instance._get_tracked_values()
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None):
+        super().refresh_from_db(using=using, fields=fields)
+
+        values = self._get_tracked_values()
+        if fields is not None and self.is_tracked:
+            # Also used to load deferred fields, keep the snapshot of everything else
+            refreshed = {self._meta.get_field(field_name).attname for field_name in fields}
+            values = {**self._loaded_values, **{
+                attname: value for attname, value in values.items() if attname in refreshed
+            }}
+        self._loaded_values = values
+
+    def _get_tracked_values(self):
+        deferred_fields = self.get_deferred_fields()
+
+        return {
+            field.attname: self._get_tracked_value(field)
+            for field in self._meta.concrete_fields
+            if not field.primary_key and field.attname not in deferred_fields
+        }
+
+    def _get_tracked_value(self, field):
+        value = getattr(self, field.attname)
+
+        if isinstance(value, FieldFile):
+            return value.name
+        if isinstance(value, (dict, list)):
+            return deepcopy(value)
+        return value
+
+    @property
+    def is_tracked(self):
+        return getattr(self, '_loaded_values', None) is not None
+
+    def has_changed(self, field_name):
+        # Without a snapshot (new or manually built instance) everything counts as changed
+        if not self.is_tracked:
+            return True
+
+        field = self._meta.get_field(field_name)
+        if field.attname not in self._loaded_values:
+            # Deferred when loaded: changed only if it was set or loaded since
+            return field.attname in self.__dict__
+
+        return self._get_tracked_value(field) != self._loaded_values[field.attname]
+
+    def previous_value(self, field_name):
+        if not self.is_tracked:
+            return None
+
+        return self._loaded_values.get(self._meta.get_field(field_name).attname)
+
+    @property
+    def changed_fields(self):
+        return [
+            field.name for field in self._meta.concrete_fields
+            if not field.primary_key and self.has_changed(field.name)
+        ]
+
+    def save(self, force_insert=False, force_update=False, using=None, update_fields=None):
+        if (self.update_changed_fields_only and self.is_tracked and not self._state.adding
+                and not force_insert and update_fields is None):
+            update_fields = self.changed_fields
+
+            # Nothing changed - Django skips the query (and the save signals) for empty update_fields
+            if update_fields:
+                update_fields += [
+                    field.name for field in self._meta.concrete_fields
+                    if getattr(field, 'auto_now', False) and field.name not in update_fields
+                ]
+
+        super().save(force_insert=force_insert, force_update=force_update, using=using, update_fields=update_fields)
+
+        self._loaded_values = self._get_tracked_values()
@@ -1,5 +1,6 @@
 from django.contrib import admin
 
+from hillelDjango4.pagination import EstimatedCountPaginator
 from orders.models import OrderProduct, Order
 
 
@@ -10,13 +11,23 @@ class OrderProductInline(admin.TabularInline):
 
     fields = ('product', 'quantity', 'price')
     readonly_fields = ('price',)
+    # Paginated AJAX search (ProductAdmin.get_search_results) instead of every product in each row's <select>
+    autocomplete_fields = ('product',)
 
 
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
     inlines = [OrderProductInline]
 
-    list_display = ('uuid', 'user', 'total_price', 'created_at')
-
-    fields = ('user', 'total_price')
-    readonly_fields = ('total_price',)
+    list_display = ('uuid', 'user', 'total_quantity', 'total_price', 'created_at')
+    list_select_related = ('user',)
+    autocomplete_fields = ('user',)
+    # Estimated counts above a threshold, and no second COUNT(*) of the whole table
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    # Served by the (created_at, uuid) index
+    ordering = ('-created_at', '-uuid')
+
+    fields = ('user', 'total_quantity', 'total_price')
+    # Recalculated from the lines when they are saved
+    readonly_fields = ('total_quantity', 'total_price')
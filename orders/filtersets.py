@@ -0,0 +1,26 @@
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+from django_filters import FilterSet, DateTimeFilter
+
+from orders.models import Order
+
+# Superusers list every user's orders: without a date range they get the recent ones, not the whole history
+SUPERUSER_DEFAULT_DAYS = 30
+
+
+def default_created_after():
+    # Midnight, so the window (and the cache key containing it) changes once a day
+    start = timezone.localdate() - timedelta(days=SUPERUSER_DEFAULT_DAYS)
+
+    return timezone.make_aware(datetime.combine(start, time.min))
+
+
+class OrderFilterSet(FilterSet):
+    # created_after=2024-01-01 or an ISO 8601 datetime, created_before is exclusive
+    created_after = DateTimeFilter(field_name='created_at', lookup_expr='gte')
+    created_before = DateTimeFilter(field_name='created_at', lookup_expr='lt')
+
+    class Meta:
+        model = Order
+        fields = ('created_after', 'created_before')
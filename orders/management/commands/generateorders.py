@@ -1,13 +1,72 @@
+import multiprocessing
+import random
 from datetime import date, timedelta, datetime
+from itertools import accumulate
 
 from django.contrib.auth.models import User
-from django.db import transaction
+from django.db import connection, connections, transaction
+from django.utils import timezone
 from faker import Faker
 
 from django.core.management.base import BaseCommand
 
-from orders.models import Order, OrderProduct
+from hillelDjango4.cache import bump_version
+from orders.models import Order, OrderProduct, orders_cache_namespaces
+from orders.stats import rebuild_order_stats
 from products.models import Product
+from products.sales import rebuild_sales
+
+# Shared with the worker processes (set before forking, see init_worker)
+load_options = {}
+
+
+def init_worker(options):
+    load_options.update(options)
+
+
+def create_orders_batch(orders_count):
+    """Build orders, lines and totals in memory and insert them with two bulk_create() calls"""
+    products = load_options['products']
+    prices = load_options['prices']
+    cum_weights = load_options['cum_weights']
+    now = timezone.now()
+
+    orders = []
+    order_products = []
+    for _ in range(orders_count):
+        order = Order(
+            user_id=random.choice(load_options['users']),
+            created_at=now - timedelta(seconds=random.randint(0, load_options['days'] * 24 * 60 * 60)),
+        )
+        lines_count = random.randint(1, load_options['max_lines'])
+
+        total_price = total_quantity = 0
+        for product_index in random.choices(range(len(products)), cum_weights=cum_weights, k=lines_count):
+            quantity = random.randint(1, load_options['max_quantity'])
+            price = prices[product_index] * quantity
+            total_price += price
+            total_quantity += quantity
+
+            order_products.append(OrderProduct(
+                order=order, product_id=products[product_index], quantity=quantity, price=price,
+            ))
+
+        order.total_price = float(total_price)
+        order.total_quantity = total_quantity
+        orders.append(order)
+
+    # bulk_create() skips the per-line signals: no total recalculation, notifications or report tasks.
+    # auto_now_add overwrites created_at on insert: the generated dates are set again with bulk_update(),
+    # which saves the values as they are (the field itself is left alone, other threads may save orders)
+    created_at = [order.created_at for order in orders]
+    with transaction.atomic():
+        Order.objects.bulk_create(orders)
+        for order, order_created_at in zip(orders, created_at):
+            order.created_at = order_created_at
+        Order.objects.bulk_update(orders, ['created_at'])
+        OrderProduct.objects.bulk_create(order_products)
+
+    return orders_count, len(order_products)
 
 
 class Command(BaseCommand):
@@ -16,6 +75,22 @@ class Command(BaseCommand):
 
         self.fake = Faker()
 
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=100, help='Number of orders to create')
+        parser.add_argument('--bulk', action='store_true',
+                            help='Load-generation mode: build orders in memory, insert in batches')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Orders per insert batch (--bulk)')
+        parser.add_argument('--workers', type=int, default=1, help='Parallel worker processes (--bulk)')
+        parser.add_argument('--users', type=int, default=1000, help='Size of the customer pool (--bulk)')
+        parser.add_argument('--days', type=int, default=30, help='Spread order dates over this many days (--bulk)')
+        parser.add_argument('--max-lines', type=int, default=10, help='Max lines per order (--bulk)')
+        parser.add_argument('--max-quantity', type=int, default=10, help='Max quantity per line (--bulk)')
+        parser.add_argument('--popularity', type=float, default=1.0,
+                            help='Zipf exponent of product popularity, 0 picks products uniformly (--bulk)')
+        parser.add_argument('--skip-side-effects', action='store_true',
+                            help="Don't rebuild sales counters and order stats "
+                                 "or queue the orders report after loading (--bulk)")
+
     def create_order(self):
         yesterday = date.today() - timedelta(days=1)
         random_time = self.fake.time_object()
@@ -43,7 +118,83 @@ class Command(BaseCommand):
                 quantity=product_quantity,
             )
 
-    @transaction.atomic
     def handle(self, *args, **options):
-        for _ in range(100):
-            self.create_order()
+        if options['bulk']:
+            self.bulk_generate(options)
+            return
+
+        with transaction.atomic():
+            for _ in range(options['orders']):
+                self.create_order()
+
+    def get_users(self, count):
+        # Reusable pool of customers, created once
+        users = [
+            User(username=f'loadgen_{number}', email=f'loadgen_{number}@example.com', password='!')
+            for number in range(count)
+        ]
+        User.objects.bulk_create(users, ignore_conflicts=True)
+
+        return list(User.objects.filter(username__startswith='loadgen_').values_list('id', flat=True)[:count])
+
+    def bulk_generate(self, options):
+        products = list(Product.objects.values_list('id', 'price').iterator())
+        if not products:
+            self.stdout.write(self.style.WARNING('No products, run loadproducts first'))
+            return
+
+        # Zipf-like popularity: the n-th product (in random order) is picked with weight 1 / n^s
+        random.shuffle(products)
+        products, prices = zip(*products)
+        cum_weights = list(accumulate(1 / (rank ** options['popularity']) for rank in range(1, len(products) + 1)))
+
+        worker_options = {
+            'products': products,
+            'prices': prices,
+            'cum_weights': cum_weights,
+            'users': self.get_users(options['users']),
+            'days': options['days'],
+            'max_lines': options['max_lines'],
+            'max_quantity': options['max_quantity'],
+        }
+
+        total = options['orders']
+        batches = [min(options['batch_size'], total - start) for start in range(0, total, options['batch_size'])]
+
+        workers = options['workers']
+        if connection.vendor == 'sqlite':
+            # SQLite allows a single writer
+            workers = 1
+
+        created_orders = created_lines = 0
+        if workers > 1:
+            # Forked workers must not share the parent's database connection
+            connections.close_all()
+            pool = multiprocessing.get_context('fork').Pool(workers, initializer=init_worker,
+                                                            initargs=(worker_options,))
+            with pool:
+                results = pool.imap_unordered(create_orders_batch, batches)
+                for orders_count, lines_count in results:
+                    created_orders += orders_count
+                    created_lines += lines_count
+                    self.stdout.write(f"Created {created_orders}/{total} orders ({created_lines} lines)")
+        else:
+            init_worker(worker_options)
+            for batch in batches:
+                orders_count, lines_count = create_orders_batch(batch)
+                created_orders += orders_count
+                created_lines += lines_count
+                self.stdout.write(f"Created {created_orders}/{total} orders ({created_lines} lines)")
+
+        # Derived data is refreshed once for the whole load instead of per line
+        for user_id in worker_options['users']:
+            bump_version(*orders_cache_namespaces(user_id))
+        if not options['skip_side_effects']:
+            rebuild_sales()
+            rebuild_order_stats()
+
+            # Backdated orders: the sheet is rebuilt in date order instead of appending them last
+            from orders.tasks import rebuild_orders_report
+            rebuild_orders_report.debounce()
+
+        self.stdout.write(self.style.SUCCESS(f"Created {created_orders} orders with {created_lines} lines."))
@@ -0,0 +1,28 @@
+from datetime import datetime
+
+from django.core.management import BaseCommand
+from django.utils import timezone
+
+from orders.models import OrderStats
+from orders.stats import rebuild_order_stats
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the hourly and daily order rollups (used by the stats report) from orders'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', type=datetime.fromisoformat,
+                            help='Only rebuild from this date on, e.g. 2024-01-31')
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        since = options['since']
+        if since is not None and timezone.is_naive(since):
+            since = timezone.make_aware(since)
+
+        rebuild_order_stats(since=since, batch_size=options['batch_size'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {OrderStats.objects.filter(period=OrderStats.DAY).count()} daily "
+            f"and {OrderStats.objects.filter(period=OrderStats.HOUR).count()} hourly rows."
+        ))
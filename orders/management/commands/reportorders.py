@@ -4,5 +4,18 @@ from orders.reporter import report_orders
 
 
 class Command(BaseCommand):
+    help = 'Append new orders to the orders report sheet'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Clear the sheet and export all the orders again')
+        parser.add_argument('--partitions', type=int, default=0,
+                            help='With --full: rebuild in this many parallel Celery tasks instead of in this process')
+
     def handle(self, *args, **options):
-        report_orders()
\ No newline at end of file
+        if options['full'] and options['partitions'] > 1:
+            from orders.tasks import rebuild_orders_report
+            rebuild_orders_report.delay(partitions=options['partitions'])
+            self.stdout.write(f"Queued a rebuild in {options['partitions']} partitions.")
+            return
+
+        report_orders(full=options['full'])
@@ -0,0 +1,38 @@
+# Generated by Django 5.0.7 on 2026-10-18 13:58
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def fill_totals(apps, schema_editor):
+    # Historical models don't have OrderQuerySet.update_totals(), same UPDATE written out
+    Order = apps.get_model('orders', 'Order')
+    OrderProduct = apps.get_model('orders', 'OrderProduct')
+
+    def line_totals(field):
+        lines = OrderProduct.objects.filter(order=OuterRef('pk')).order_by().values('order').annotate(total=Sum(field))
+        return Coalesce(Subquery(lines.values('total')), 0, output_field=models.DecimalField())
+
+    Order.objects.update(total_quantity=line_totals('quantity'), total_price=line_totals('price'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0004_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='total_quantity',
+            field=models.DecimalField(decimal_places=3, default=0, max_digits=12),
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='total_price',
+            field=models.FloatField(default=0, null=True),
+        ),
+        migrations.RunPython(fill_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.0.7 on 2026-10-18 14:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0006_reportexport'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day')], max_length=4)),
+                ('start', models.DateTimeField()),
+                ('orders', models.IntegerField(default=0)),
+                ('quantity', models.DecimalField(decimal_places=3, default=0, max_digits=16)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='orderstats',
+            constraint=models.UniqueConstraint(fields=('period', 'start'), name='orders_stats_unique'),
+        ),
+    ]
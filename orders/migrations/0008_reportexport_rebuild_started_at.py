@@ -0,0 +1,18 @@
+# Generated by Django 5.0.7 on 2026-10-18 14:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0007_orderstats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reportexport',
+            name='rebuild_started_at',
+            field=models.DateTimeField(null=True),
+        ),
+    ]
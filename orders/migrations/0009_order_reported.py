@@ -0,0 +1,39 @@
+# Generated by Django 5.0.7 on 2026-10-18 14:22
+
+from django.db import migrations, models
+from django.db.models import Q
+
+
+def mark_reported(apps, schema_editor):
+    # Everything up to the old high-water mark is in the sheet already.
+    # Without one, the first report run rewrites the sheet (see report_orders())
+    Order = apps.get_model('orders', 'Order')
+    ReportExport = apps.get_model('orders', 'ReportExport')
+
+    export = ReportExport.objects.filter(name='orders', last_created_at__isnull=False).first()
+    if export is not None:
+        Order.objects.filter(
+            Q(created_at__lt=export.last_created_at) | Q(created_at=export.last_created_at, uuid__lte=export.last_uuid)
+        ).update(reported=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0008_reportexport_rebuild_started_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='reported',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(
+                condition=models.Q(('reported', False)), fields=['created_at', 'uuid'], name='orders_unreported_idx',
+            ),
+        ),
+        migrations.RunPython(mark_reported, migrations.RunPython.noop),
+    ]
@@ -1,27 +1,97 @@
 import uuid
 
-from django.core.cache import cache
 from django.db import models, transaction
-from django.db.models.signals import post_save, pre_save
+from django.db.models import OuterRef, Q, QuerySet, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
+from django.utils import timezone
+
+from hillelDjango4.cache import bump_version
+from hillelDjango4.tracking import ChangeTrackingMixin
+from orders.signals import order_products_created
+
+
+def line_totals(field):
+    # SUM(order_products.<field>) of the outer order, 0 without lines
+    lines = OrderProduct.objects.filter(order=OuterRef('pk')).order_by().values('order').annotate(total=Sum(field))
+
+    return Coalesce(Subquery(lines.values('total')), 0, output_field=models.DecimalField())
+
+
+class OrderQuerySet(models.QuerySet):
+    def with_totals(self):
+        """Totals computed from the lines, for checks and ad-hoc reports (the stored columns are usually enough)"""
+        return self.annotate(
+            computed_total_quantity=line_totals('quantity'),
+            computed_total_price=line_totals('price'),
+        )
+
+    def update_totals(self):
+        """Recalculate the stored totals of these orders in one UPDATE"""
+        return self.update(
+            total_quantity=line_totals('quantity'),
+            total_price=line_totals('price'),
+            updated_at=timezone.now(),
+        )
+
+
+class OrderManager(models.Manager.from_queryset(OrderQuerySet)):
+    @transaction.atomic
+    def create_with_products(self, user, order_products):
+        """
+        order_products: [(product, quantity)], the products already loaded (in_bulk).
+        One INSERT for the order with its total, one for all the lines: no per-line signals.
+        The lines are returned in order.created_lines.
+        """
+        lines = [
+            OrderProduct(product=product, quantity=quantity, price=product.price * quantity)
+            for product, quantity in order_products
+        ]
+        order = self.create(
+            user=user,
+            total_price=float(sum(line.price for line in lines)),
+            total_quantity=sum(line.quantity for line in lines),
+        )
+
+        for line in lines:
+            line.order = order
+        OrderProduct.objects.bulk_create(lines)
+        order_products_created.send(sender=OrderProduct, order_products=lines)
+
+        # OrderSerializer renders these instead of querying the lines back
+        order.created_lines = lines
+
+        return order
 
 
 class Order(models.Model):
     uuid = models.UUIDField(primary_key=True, editable=False, default=uuid.uuid4)
     user = models.ForeignKey('auth.User', on_delete=models.CASCADE)
-    total_price = models.FloatField(null=True)
+    # Stored totals of the lines, kept up to date by OrderQuerySet.update_totals()
+    total_price = models.FloatField(null=True, default=0)
+    total_quantity = models.DecimalField(max_digits=12, decimal_places=3, default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Set once the order is in the Google Sheets report (orders/reporter.py)
+    reported = models.BooleanField(default=False, editable=False)
     products = models.ManyToManyField('products.Product', through='OrderProduct')
 
-    @property
-    def total_quantity(self):
-        return sum([op.quantity for op in self.order_products.all()])
+    objects = OrderManager()
 
-    def update_total_price(self):
-        with transaction.atomic():
-            self.total_price = sum([op.price for op in self.order_products.all()])
-            self.save()
+    class Meta:
+        indexes = [
+            # Keyset pagination of the order list, newest first (uuid is the tiebreaker)
+            models.Index(fields=['user', 'created_at', 'uuid'], name='orders_user_created_idx'),
+            models.Index(fields=['created_at', 'uuid'], name='orders_created_idx'),
+            # Only the orders still to export: stays small however many orders there are
+            models.Index(fields=['created_at', 'uuid'], condition=Q(reported=False), name='orders_unreported_idx'),
+        ]
+
+
+def orders_cache_namespaces(user_id):
+    # Per-user lists and the superuser list containing every order
+    return f'orders:{user_id}', 'orders:all'
 
 
 @receiver(post_save, sender=Order)
@@ -29,28 +99,151 @@ def order_create_signal(sender, instance, created, **kwargs):
     if created:
         from orders.tasks import send_order_creation_notification, update_orders_report
         send_order_creation_notification.delay(instance.pk)
-        update_orders_report.delay()
+        # The report appends the orders not exported yet: it must see this one committed.
+        # Coalesced: one report run for a burst of orders (see hillelDjango4/dispatch.py)
+        transaction.on_commit(update_orders_report.debounce)
+
+    bump_version(*orders_cache_namespaces(instance.user_id))
+
+
+@receiver(post_delete, sender=Order)
+def order_delete_signal(sender, instance, **kwargs):
+    bump_version(*orders_cache_namespaces(instance.user_id))
+
+
+@receiver(post_save, sender=Order)
+def record_order_stats(sender, instance, created, **kwargs):
+    if created:
+        from orders.stats import record_orders
+        record_orders([instance])
+
+
+def is_order_delete(origin):
+    """Whether a delete started from orders (an order or a queryset of them): their lines go in the cascade"""
+    if isinstance(origin, QuerySet):
+        return origin.model is Order
+    return isinstance(origin, Order)
+
+
+@receiver(pre_delete, sender=Order)
+def collect_order_lines_totals(sender, instance, **kwargs):
+    # The cascade deletes the lines first, without their per-line updates (see revert_order_lines_stats)
+    instance.deleted_lines_totals = instance.order_products.aggregate(
+        quantity=Sum('quantity', default=0), revenue=Sum('price', default=0),
+    )
+
 
-    cache.delete(f'orders:{instance.user_id}')
+@receiver(post_delete, sender=Order)
+def revert_order_stats(sender, instance, **kwargs):
+    # The order and its lines in one increment
+    from orders.stats import increment_stats
+    totals = instance.deleted_lines_totals
+    increment_stats([(instance.created_at, -1, -totals['quantity'], -totals['revenue'])])
 
 
-class OrderProduct(models.Model):
+class OrderProduct(ChangeTrackingMixin, models.Model):
+    # price is recalculated in a pre_save signal, after update_fields would be decided
+    update_changed_fields_only = False
+
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='order_products')
     product = models.ForeignKey('products.Product', on_delete=models.CASCADE)
     quantity = models.DecimalField(max_digits=10, decimal_places=3)
     price = models.DecimalField(max_digits=10, decimal_places=2)
 
 
-@receiver(post_save, sender=OrderProduct)
-def update_order_total_price_signal(sender, instance, **kwargs):
-    instance.order.update_total_price()
+@receiver([post_save, post_delete], sender=OrderProduct)
+def update_order_totals_signal(sender, instance, origin=None, **kwargs):
+    if is_order_delete(origin):
+        return
+
+    # A single aggregate UPDATE, without loading the lines or saving the order
+    Order.objects.filter(pk=instance.order_id).update_totals()
 
 
 @receiver(post_save, sender=OrderProduct)
-def clear_cache(sender, instance, **kwargs):
-    cache.delete(f'orders:{instance.order.user_id}')
+def order_product_create_signal(sender, instance, created, **kwargs):
+    if created:
+        order_products_created.send(sender=OrderProduct, order_products=[instance])
+
+
+@receiver([post_save, post_delete], sender=OrderProduct)
+def clear_cache(sender, instance, origin=None, **kwargs):
+    if is_order_delete(origin):
+        # order_delete_signal bumps them
+        return
+
+    bump_version(*orders_cache_namespaces(instance.order.user_id))
 
 
 @receiver(pre_save, sender=OrderProduct)
 def update_order_product_price(sender, instance: OrderProduct, **kwargs):
     instance.price = instance.product.price * instance.quantity
+
+
+@receiver(order_products_created)
+def record_order_lines_stats(sender, order_products, **kwargs):
+    from orders.stats import record_order_lines
+    record_order_lines(order_products)
+
+
+@receiver(post_save, sender=OrderProduct)
+def update_order_lines_stats(sender, instance: OrderProduct, created, **kwargs):
+    # New lines are counted by order_products_created; here only the difference to the loaded values
+    if created or not instance.is_tracked:
+        return
+
+    from orders.stats import increment_stats
+    increment_stats([(
+        instance.order.created_at,
+        0,
+        instance.quantity - instance.previous_value('quantity'),
+        instance.price - instance.previous_value('price'),
+    )])
+
+
+@receiver(post_delete, sender=OrderProduct)
+def revert_order_lines_stats(sender, instance: OrderProduct, origin=None, **kwargs):
+    if is_order_delete(origin):
+        # Reverted with the order by revert_order_stats, not with a lookup and an UPDATE per line
+        return
+
+    from orders.stats import record_order_lines
+    record_order_lines([instance], sign=-1)
+
+
+class OrderStats(models.Model):
+    """Orders, sold quantity and revenue per hour and per day (order date), maintained by orders/stats.py"""
+    HOUR = 'hour'
+    DAY = 'day'
+    PERIODS = [(HOUR, 'Hour'), (DAY, 'Day')]
+
+    period = models.CharField(max_length=4, choices=PERIODS)
+    # Start of the hour or of the day, in the current time zone
+    start = models.DateTimeField()
+    orders = models.IntegerField(default=0)
+    quantity = models.DecimalField(max_digits=16, decimal_places=3, default=0)
+    revenue = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            # Also serves the (period, start range) reads
+            models.UniqueConstraint(fields=['period', 'start'], name='orders_stats_unique'),
+        ]
+
+
+class ReportExport(models.Model):
+    """
+    State of an append-only report: the rows written and the last order appended.
+    Which orders are in it is Order.reported - a mark would miss the orders committed
+    late or created in the past (generateorders --bulk).
+    """
+    name = models.CharField(max_length=100, unique=True)
+    last_created_at = models.DateTimeField(null=True)
+    last_uuid = models.UUIDField(null=True)
+    rows = models.PositiveIntegerField(default=0)
+    # Set while a parallel rebuild writes the rows (see orders/reporter.py)
+    rebuild_started_at = models.DateTimeField(null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.name}: {self.rows} rows'
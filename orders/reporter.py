@@ -1,33 +1,321 @@
-from google_sheets.service import write_to_sheet
-from orders.models import Order
+import math
+from datetime import datetime, timedelta
 
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.db.models.functions import TruncDay
+from django.utils import timezone
 
-def report_orders():
-    orders = Order.objects.all().prefetch_related('products').order_by('created_at')
+from google_sheets.service import SPREADSHEET_ID, bulk_write_to_sheet, clear_sheet, write_to_sheet
+from orders.models import Order, ReportExport
+from orders.stats import get_order_totals
 
-    sheets_data = []
+ORDERS_REPORT = 'orders'
+ORDERS_REPORT_RANGE = 'A2:F'
+# The first data row, under the header
+ORDERS_REPORT_FIRST_ROW = 2
+REPORT_CHUNK_SIZE = 1000
+# Chunks sent in one batch update by a rebuild partition: bounds its memory
+REBUILD_WRITE_CHUNKS = 5
+# Incremental runs wait for a rebuild this long at most (it may have failed)
+REBUILD_TIMEOUT = timedelta(hours=1)
 
-    for order in orders:
-        django_admin_link = "http://localhost:8000/admin/orders/order/{}/change/".format(order.uuid)
 
-        sheets_data.append([
-            str(order.uuid),
-            order.user.email,
-            float(order.total_price),
-            float(order.total_quantity),
-            django_admin_link,
-            order.created_at.strftime("%Y-%m-%d %H:%M:%S")
-        ])
+def order_row(order):
+    django_admin_link = "http://localhost:8000/admin/orders/order/{}/change/".format(order.uuid)
 
-    write_to_sheet("A2:F", sheets_data)
+    return [
+        str(order.uuid),
+        order.user.email,
+        float(order.total_price),
+        float(order.total_quantity),
+        django_admin_link,
+        order.created_at.strftime("%Y-%m-%d %H:%M:%S")
+    ]
 
 
-def report_order_stats():
-    orders = Order.objects.all().prefetch_related('products').order_by('created_at')
+def report_queryset():
+    # Stored totals and the user in the same query: the lines are not loaded.
+    # Served by the (created_at, uuid) index, like the keyset pagination of the API
+    return Order.objects.select_related('user').order_by('created_at', 'uuid')
+
+
+def is_rebuilding(export):
+    return export.rebuild_started_at is not None and export.rebuild_started_at > timezone.now() - REBUILD_TIMEOUT
+
+
+def claim_report():
+    """
+    Starts rewriting the report (a full run or a rebuild): clears it and returns the claim, its start time,
+    or None if another rewrite holds it. Whatever task started it, incremental runs and other rewrites
+    wait until release_report() or REBUILD_TIMEOUT.
+    """
+    ReportExport.objects.get_or_create(name=ORDERS_REPORT)
+
+    with transaction.atomic():
+        # Waits for an incremental run appending a chunk (see append_orders())
+        export = ReportExport.objects.select_for_update().get(name=ORDERS_REPORT)
+        if is_rebuilding(export):
+            return None
+
+        export.last_created_at = export.last_uuid = None
+        export.rows = 0
+        export.rebuild_started_at = timezone.now()
+        export.save()
+
+    clear_sheet(ORDERS_REPORT_RANGE)
+
+    # Order.reported isn't reset here (a write of every row): each rewrite unmarks the orders of its
+    # range it doesn't get to (see unmark_after()), the rest it marks as it writes them
+    return export.rebuild_started_at
+
+
+def release_report(claim, **values):
+    """Ends a rewrite, setting `values` on the export. False if the claim was lost: it expired and was taken"""
+    return bool(
+        ReportExport.objects.filter(name=ORDERS_REPORT, rebuild_started_at=claim)
+        .update(rebuild_started_at=None, updated_at=timezone.now(), **values)
+    )
+
+
+def report_orders(full=False):
+    """
+    Appends the orders not exported yet (Order.reported) to the sheet, in chunks.
+    Late commits and backdated orders are appended when they show up, after the newer rows.
+    full=True clears the sheet and exports everything again, in this process
+    (see plan_report_partitions() for the parallel version).
+    """
+    export, created = ReportExport.objects.get_or_create(name=ORDERS_REPORT)
+    orders = report_queryset()
+    claim = None
+
+    # First run: the sheet may hold the rows of the reporter before Order.reported (it rewrote everything
+    # each time), with no order marked - appending would duplicate all of them
+    if full or created:
+        claim = claim_report()
+        if claim is None:
+            # A rebuild or another full run writes everything already
+            return
+    elif is_rebuilding(export):
+        # Appending would interleave with the rewritten rows; the rewrite runs us again when done
+        return
+    else:
+        orders = orders.filter(reported=False)
+
+    written = None
+    try:
+        chunk = []
+        for order in orders.iterator(chunk_size=REPORT_CHUNK_SIZE):
+            chunk.append(order)
+
+            if len(chunk) == REPORT_CHUNK_SIZE:
+                if not append_orders(chunk, claim):
+                    return
+                written = chunk[-1]
+                chunk = []
+
+        if chunk and not append_orders(chunk, claim):
+            return
+
+        if claim is not None:
+            clear_rows_after(ReportExport.objects.get(name=ORDERS_REPORT).rows)
+    except Exception:
+        if claim is not None:
+            # Cleared from the sheet but not written again: the next run appends them
+            unmark_after(report_queryset(), written)
+        raise
+    finally:
+        if claim is not None:
+            release_report(claim)
+
+
+def mark_reported(orders):
+    Order.objects.filter(pk__in=[order.pk for order in orders], reported=False).update(reported=True)
+
+
+def after_key(orders, key, inclusive=False):
+    """The orders after the (created_at, uuid) key, in report order"""
+    created_at, uuid = key
+    uuid_lookup = 'uuid__gte' if inclusive else 'uuid__gt'
+    return orders.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, **{uuid_lookup: uuid}))
+
+
+def unmark_after(orders, last_order):
+    """Unmarks the orders not written after last_order (None: none written), only the marked ones are updated"""
+    if last_order is not None:
+        orders = after_key(orders, (last_order.created_at, last_order.uuid))
+    orders.filter(reported=True).update(reported=False)
+
+
+def current_claim(export):
+    return export.rebuild_started_at if is_rebuilding(export) else None
+
+
+def append_orders(orders, claim=None):
+    """
+    Writes the rows of the orders after the last row, as the rewrite holding `claim` or as an incremental run.
+    False if a rewrite started (or took over) meanwhile: it writes these orders itself.
+    """
+    # The rows are reserved in a short transaction: the Sheets call is made without holding the lock
+    with transaction.atomic():
+        export = ReportExport.objects.select_for_update().get(name=ORDERS_REPORT)
+        if current_claim(export) != claim:
+            return False
+
+        first_row = ORDERS_REPORT_FIRST_ROW + export.rows
+        export.last_created_at = orders[-1].created_at
+        export.last_uuid = orders[-1].uuid
+        export.rows += len(orders)
+        export.save(update_fields=['last_created_at', 'last_uuid', 'rows', 'updated_at'])
+
+    try:
+        write_to_sheet(f'A{first_row}:F{first_row + len(orders) - 1}', [order_row(order) for order in orders])
+    except Exception:
+        # Gives the rows back, unless the report moved on (a rewrite cleared it)
+        ReportExport.objects.filter(name=ORDERS_REPORT, rows=export.rows).update(rows=F('rows') - len(orders))
+        raise
 
-    total_orders = orders.count()
-    total_products = sum([order.total_quantity for order in orders])
-    total_price = sum([order.total_price for order in orders])
+    with transaction.atomic():
+        # Marked only if no rewrite started during the write: that one resets the flags and writes them
+        if current_claim(ReportExport.objects.select_for_update().get(name=ORDERS_REPORT)) != claim:
+            return False
+        mark_reported(orders)
+
+    return True
+
+
+def clear_rows_after(rows):
+    # Rows an incremental run reserved before a rewrite started may land after the rewritten ones
+    clear_sheet(f'A{ORDERS_REPORT_FIRST_ROW + rows}:F')
+
+
+def plan_report_partitions(partitions, until):
+    """
+    [(since, until, first_row, count)] splitting the orders created before `until` into about `partitions`
+    ranges of whole days with similar numbers of orders. since and until are the (created_at, uuid) keys
+    of the first order of the range and of the next one (None: open ended), first_row is where the range's
+    rows start and count how many orders it has now.
+    """
+    days = list(
+        Order.objects.filter(created_at__lt=until)
+        .values(day=TruncDay('created_at')).annotate(count=Count('pk')).order_by('day')
+        .values_list('day', 'count')
+    )
+    if not days:
+        return []
+
+    per_partition = math.ceil(sum(count for _, count in days) / partitions)
+
+    groups = [[]]
+    for day, count in days:
+        if sum(group_count for _, group_count in groups[-1]) >= per_partition:
+            groups.append([])
+        groups[-1].append((day, count))
+
+    # Keys, not dates: orders committed or deleted later can't move a row to another range.
+    # Open ended first range: nothing is lost to time zone edges
+    keys = [None] + [
+        report_queryset().filter(created_at__gte=group[0][0]).values_list('created_at', 'uuid').first()
+        for group in groups[1:]
+    ] + [None]
+
+    ranges = []
+    first_row = ORDERS_REPORT_FIRST_ROW
+    for index, group in enumerate(groups):
+        count = sum(group_count for _, group_count in group)
+        ranges.append((keys[index], keys[index + 1], first_row, count))
+        first_row += count
+
+    return ranges
+
+
+def write_report_partition(since, until, first_row, count, claim):
+    """
+    Writes the rows of the orders from the key `since` to the key `until` (excluded), from first_row on,
+    REBUILD_WRITE_CHUNKS chunks per batch update. At most `count` rows: never over the next range.
+    The orders of the range are marked reported as they are written, unmarked if they are not.
+    Returns (rows, last created_at, last uuid).
+    """
+    if not ReportExport.objects.filter(name=ORDERS_REPORT, rebuild_started_at=claim).exists():
+        # The rebuild timed out and another rewrite took the report
+        return 0, None, None
+
+    orders = report_queryset()
+    if since is not None:
+        orders = after_key(orders, since, inclusive=True)
+    if until is not None:
+        orders = orders.filter(Q(created_at__lt=until[0]) | Q(created_at=until[0], uuid__lt=until[1]))
+
+    data = {}
+    chunk = []
+    row = first_row
+    last_order = None
+    for last_order in orders[:count].iterator(chunk_size=REPORT_CHUNK_SIZE):
+        chunk.append(last_order)
+
+        if len(chunk) == REPORT_CHUNK_SIZE:
+            row = add_partition_chunk(data, chunk, row)
+            chunk = []
+
+        if len(data) == REBUILD_WRITE_CHUNKS:
+            write_partition_chunks(data)
+            data = {}
+
+    if chunk:
+        row = add_partition_chunk(data, chunk, row)
+    if data:
+        write_partition_chunks(data)
+
+    # Pushed out of the planned count by late commits: the next incremental run appends them
+    unmark_after(orders.order_by(), last_order)
+
+    if last_order is None:
+        return 0, None, None
+    return row - first_row, last_order.created_at.isoformat(), str(last_order.uuid)
+
+
+def add_partition_chunk(data, orders, row):
+    """Adds the rows of the orders to the batch from `row` on, returns the row after them"""
+    data[f'A{row}:F{row + len(orders) - 1}'] = orders
+    return row + len(orders)
+
+
+def write_partition_chunks(data):
+    bulk_write_to_sheet(SPREADSHEET_ID, {
+        cells: [order_row(order) for order in orders] for cells, orders in data.items()
+    })
+    mark_reported([order for orders in data.values() for order in orders])
+
+
+def finish_report_rebuild(results, claim, planned):
+    """
+    results of write_report_partition() in partition order, planned: the counts of the plan.
+    Ends the rebuild; False if the rows don't match the plan (orders deleted since planning leave
+    blank rows) and the report has to be written again.
+    """
+    rows = [partition_rows for partition_rows, _, _ in results]
+    if rows == planned:
+        clear_rows_after(sum(rows))
+
+    marks = [(created_at, uuid) for _, created_at, uuid in results if created_at is not None]
+    last_created_at, last_uuid = marks[-1] if marks else (None, None)
+
+    released = release_report(
+        claim,
+        rows=sum(rows),
+        last_created_at=last_created_at and datetime.fromisoformat(last_created_at),
+        last_uuid=last_uuid,
+    )
+    # Not released: another rewrite took the report over
+    return not released or rows == planned
+
+
+def report_order_stats():
+    # Daily rollups (orders/stats.py): the cost doesn't grow with the number of orders
+    totals = get_order_totals()
+    total_orders = totals['orders']
+    total_products = totals['quantity']
+    total_price = totals['revenue']
 
     sheets_data = [
         ["Total Orders", total_orders],
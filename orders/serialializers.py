@@ -1,6 +1,7 @@
-from orders.models import Order, OrderProduct
+from orders.models import Order, OrderProduct, OrderStats
 from rest_framework import serializers
 
+from products.models import Product
 from products.serializers import ProductSerializer
 
 
@@ -12,13 +13,30 @@ class OrderProductViewSerializer(serializers.ModelSerializer):
         fields = ('product', 'quantity')
 
 
+class OrderProductListSerializer(serializers.ListSerializer):
+    def get_attribute(self, instance):
+        # Lines just created by Order.objects.create_with_products(), without querying them back
+        lines = getattr(instance, 'created_lines', None)
+        if lines is not None:
+            return lines
+
+        return super().get_attribute(instance)
+
+
 class OrderProductSerializer(serializers.ModelSerializer):
+    # A product id, loaded together with the other lines in OrderSerializer.validate_order_products()
+    product = serializers.IntegerField(min_value=1)
+
+    # Renders the lines, what hillelDjango4.prefetch plans the queries for
+    representation_serializer_class = OrderProductViewSerializer
+
     class Meta:
         model = OrderProduct
         fields = ('product', 'quantity')
+        list_serializer_class = OrderProductListSerializer
 
     def to_representation(self, instance):
-        return OrderProductViewSerializer().to_representation(instance)
+        return self.representation_serializer_class().to_representation(instance)
 
 
 class OrderSerializer(serializers.ModelSerializer):
@@ -30,11 +48,31 @@ class OrderSerializer(serializers.ModelSerializer):
         fields = ('uuid', 'user', 'order_products', 'created_at')
         read_only_fields = ('created_at',)
 
+    def validate_order_products(self, order_products):
+        # One query for all the products (and their category and tags, for the response)
+        products = Product.objects.select_related('category').prefetch_related('tags').in_bulk(
+            [order_product['product'] for order_product in order_products]
+        )
+
+        missing = [
+            order_product['product'] for order_product in order_products if order_product['product'] not in products
+        ]
+        if missing:
+            raise serializers.ValidationError(f'Invalid pk {missing} - object does not exist.')
+
+        return [
+            {**order_product, 'product': products[order_product['product']]} for order_product in order_products
+        ]
+
     def create(self, validated_data):
         order_products = validated_data.pop('order_products')
-        order = Order.objects.create(**validated_data)
 
-        for order_product in order_products:
-            OrderProduct.objects.create(order=order, **order_product)
+        return Order.objects.create_with_products(validated_data['user'], [
+            (order_product['product'], order_product['quantity']) for order_product in order_products
+        ])
 
-        return order
+
+class OrderStatsSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = OrderStats
+        fields = ('period', 'start', 'orders', 'quantity', 'revenue')
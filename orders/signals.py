@@ -0,0 +1,5 @@
+from django.dispatch import Signal
+
+# Sent with `order_products=[...]` whenever new order lines are written,
+# including bulk_create() paths that skip post_save.
+order_products_created = Signal()
@@ -0,0 +1,96 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDay, TruncHour
+from django.utils import timezone
+
+from hillelDjango4.counters import increment_many
+from orders.models import Order, OrderProduct, OrderStats
+
+
+def period_starts(created_at):
+    """{period: start} of the hour and the day containing created_at, like TruncHour / TruncDay"""
+    if timezone.is_aware(created_at):
+        created_at = timezone.localtime(created_at)
+
+    hour = created_at.replace(minute=0, second=0, microsecond=0)
+
+    return {OrderStats.HOUR: hour, OrderStats.DAY: hour.replace(hour=0)}
+
+
+def record_orders(orders, sign=1):
+    """Count (or with sign=-1 uncount) the given orders"""
+    increment_stats((order.created_at, sign, 0, 0) for order in orders)
+
+
+def record_order_lines(order_products, sign=1):
+    """Add (or with sign=-1 remove) the quantities and prices of the given order lines"""
+    increment_stats(
+        (op.order.created_at, 0, sign * op.quantity, sign * op.price)
+        for op in order_products
+    )
+
+
+def increment_stats(rows):
+    """Apply (created_at, orders, quantity, revenue) deltas, grouped so each rollup row is touched once"""
+    deltas = defaultdict(lambda: defaultdict(int))
+
+    for created_at, orders, quantity, revenue in rows:
+        for period, start in period_starts(created_at).items():
+            values = deltas[(('period', period), ('start', start))]
+            values['orders'] += orders
+            values['quantity'] += quantity
+            values['revenue'] += revenue
+
+    increment_many(OrderStats, {key: dict(values) for key, values in deltas.items()})
+
+
+@transaction.atomic
+def rebuild_order_stats(since=None, batch_size=5000):
+    """Recompute the rollups from orders and their lines, all of them or from the day of `since` on"""
+    stats = OrderStats.objects.all()
+    orders = Order.objects.all()
+    order_products = OrderProduct.objects.all()
+
+    if since is not None:
+        since = period_starts(since)[OrderStats.DAY]
+        stats = stats.filter(start__gte=since)
+        orders = orders.filter(created_at__gte=since)
+        order_products = order_products.filter(order__created_at__gte=since)
+
+    stats.delete()
+
+    for period, trunc in [(OrderStats.HOUR, TruncHour), (OrderStats.DAY, TruncDay)]:
+        rows = defaultdict(dict)
+        for row in orders.values(start=trunc('created_at')).annotate(orders=Count('pk')).order_by():
+            rows[row['start']]['orders'] = row['orders']
+        for row in order_products.values(start=trunc('order__created_at')).annotate(
+            quantity=Sum('quantity'), revenue=Sum('price'),
+        ).order_by():
+            rows[row['start']].update(quantity=row['quantity'], revenue=row['revenue'])
+
+        OrderStats.objects.bulk_create(
+            (OrderStats(period=period, start=start, **values) for start, values in rows.items()),
+            batch_size=batch_size,
+        )
+
+
+def get_order_totals(since=None, until=None):
+    """Orders, quantity and revenue from the daily rollups: one row per day is read, not every order"""
+    stats = OrderStats.objects.filter(period=OrderStats.DAY)
+    if since is not None:
+        stats = stats.filter(start__gte=since)
+    if until is not None:
+        stats = stats.filter(start__lt=until)
+
+    return sum_stats(stats)
+
+
+def sum_stats(stats):
+    """Orders, quantity and revenue of the given rollup rows"""
+    return stats.aggregate(
+        orders=Sum('orders', default=0),
+        quantity=Sum('quantity', default=0),
+        revenue=Sum('revenue', default=0),
+    )
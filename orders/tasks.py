@@ -1,10 +1,18 @@
 import random
+from datetime import datetime
 from time import sleep
 
+from celery import chord
+from django.utils import timezone
+
 from hillelDjango4.celery import app
+from hillelDjango4.dispatch import CoalescedTask
 from telegram.models import TelegramUserAccount
 from telegram.service import send_telegram_message
-from orders.reporter import report_orders, report_order_stats
+from orders.reporter import (
+    claim_report, finish_report_rebuild, plan_report_partitions, release_report, report_orders, report_order_stats,
+    write_report_partition,
+)
 
 
 @app.task(bind=True)
@@ -17,12 +25,87 @@ def send_order_creation_notification(self, order_id):
     return f"Order {order_id} was created!"
 
 
+# Queued with debounce(): a burst of orders runs the report once
+@app.task(bind=True, base=CoalescedTask, coalesce_window=5)
+def update_orders_report(self, full=False):
+    report_orders(full=full)
+
+
+# Rebuilds queued again after a failure or a mismatch, the first one included
+REBUILD_ATTEMPTS = 3
+
+
+def dump_key(key):
+    # Datetimes as ISO strings: the task serializer is JSON
+    return key and [key[0].isoformat(), str(key[1])]
+
+
+def load_key(key):
+    return key and (datetime.fromisoformat(key[0]), key[1])
+
+
+@app.task(bind=True, base=CoalescedTask)
+def rebuild_orders_report(self, partitions=8, attempt=1):
+    """
+    Full rebuild of the orders report by `partitions` workers in parallel: each writes the rows
+    of a range of orders at their final position, then finish_orders_report_rebuild checks them against the plan.
+    The report stays claimed from here to finish_orders_report_rebuild (or the error handler).
+    """
+    until = timezone.now()
+    claim = claim_report()
+    if claim is None:
+        # Another rebuild or a full run is writing it
+        return
+
+    ranges = plan_report_partitions(partitions, until)
+    writes = [
+        write_orders_report_partition.s(dump_key(since), dump_key(range_until), first_row, count, claim.isoformat())
+        for since, range_until, first_row, count in ranges
+    ]
+    planned = [count for _, _, _, count in ranges]
+    finish = finish_orders_report_rebuild.s(claim.isoformat(), planned, partitions, attempt)
+    if not writes:
+        finish.delay([])
+        return
+
+    # A partition failing for good fails the chord: its body isn't run, the error handler is
+    chord(writes)(finish.on_error(abort_orders_report_rebuild.si(claim.isoformat(), partitions, attempt)))
+
+
+def retry_rebuild(partitions, attempt):
+    # Partitioned again, a few times at most: the Sheets API may be failing for good
+    if attempt < REBUILD_ATTEMPTS:
+        rebuild_orders_report.debounce(partitions=partitions, attempt=attempt + 1)
+
+
+# Retried: rewriting the same rows at the same positions is safe
+@app.task(bind=True, autoretry_for=(Exception,), retry_backoff=True, max_retries=5)
+def write_orders_report_partition(self, since, until, first_row, count, claim):
+    return write_report_partition(load_key(since), load_key(until), first_row, count, datetime.fromisoformat(claim))
+
+
 @app.task(bind=True)
-def update_orders_report(self):
-    report_orders()
+def finish_orders_report_rebuild(self, results, claim, planned, partitions, attempt):
+    if not finish_report_rebuild(results, datetime.fromisoformat(claim), planned):
+        # Orders deleted since planning left blank rows
+        retry_rebuild(partitions, attempt)
+
+    # Orders created during the rebuild
+    update_orders_report.debounce()
 
 
 @app.task(bind=True)
+def abort_orders_report_rebuild(self, claim, partitions, attempt):
+    """Error handler of the rebuild chord: frees the report and rebuilds it again"""
+    release_report(datetime.fromisoformat(claim))
+    retry_rebuild(partitions, attempt)
+
+    # Orders created during the rebuild
+    update_orders_report.debounce()
+
+
+# Run by beat every 10 seconds: never two at a time
+@app.task(bind=True, base=CoalescedTask)
 def update_orders_total_report(self):
     report_order_stats()
 
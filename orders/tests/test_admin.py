@@ -0,0 +1,47 @@
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from orders.models import Order, OrderProduct
+from products.models import Product
+
+
+# Admin pages render static file URLs: local storages instead of S3 (no credentials in tests)
+@override_settings(STORAGES={
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+})
+class OrderAdminTestCase(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create(username='admin', is_staff=True, is_superuser=True)
+        self.client.force_login(self.admin)
+
+        self.cola = Product.objects.create(name='Coca-Cola', price=10)
+        self.order = Order.objects.create(user=self.admin)
+        OrderProduct.objects.create(order=self.order, product=self.cola, quantity=2)
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        return len(context)
+
+    def test_queries_dont_depend_on_catalogue_size(self):
+        change_url = f'/admin/orders/order/{self.order.pk}/change/'
+        # Warm up the content types cache
+        self.count_queries(change_url)
+        change_queries = self.count_queries(change_url)
+        list_queries = self.count_queries('/admin/orders/order/')
+
+        Product.objects.bulk_create([Product(name=f'Product {number}', price=10) for number in range(50)])
+        Order.objects.create(user=User.objects.create(username='another'))
+
+        self.assertEqual(self.count_queries(change_url), change_queries)
+        self.assertEqual(self.count_queries('/admin/orders/order/'), list_queries)
+
+    def test_product_autocomplete(self):
+        response = self.client.get('/admin/autocomplete/', {
+            'app_label': 'orders', 'model_name': 'orderproduct', 'field_name': 'product', 'term': 'coca',
+        })
+
+        self.assertEqual([result['text'] for result in response.json()['results']], ['Coca-Cola'])
@@ -1,9 +1,14 @@
+from datetime import timedelta
+from unittest import mock
+
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.test import TestCase
+from django.utils import timezone
 
 from orders.models import Order, OrderProduct
 from orders.serialializers import OrderSerializer
-from products.models import Product
+from products.models import Category, Product, Tag
 
 
 def paginated_response(order=None):
@@ -27,6 +32,8 @@ class OrdersApiTestCase(TestCase):
         self.assertEqual(response.json(), paginated_response(self.order))
 
     def setUp(self):
+        cache.clear()
+
         product = Product.objects.create(name='Coca-Cola', price=123.45)
         self.user = User.objects.create(username='vitalii')
         self.order = Order.objects.create(user=self.user)
@@ -53,3 +60,103 @@ class OrdersApiTestCase(TestCase):
         response = self.client.get('/api/orders/')
         self.assertEqual(response.status_code, 200)
         self.assertOrder(response)
+
+    def test_not_modified(self):
+        self.client.force_login(self.user)
+        response = self.client.get('/api/orders/')
+
+        response = self.client.get('/api/orders/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+        Order.objects.create(user=self.user)
+        response = self.client.get('/api/orders/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+
+        # Orders embed the products with their category and tag names
+        Category.objects.create(name='Drinks').delete()
+        response = self.client.get('/api/orders/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+
+    def test_list_query_count(self):
+        self.client.force_login(self.user)
+        category = Category.objects.create(name='Drinks')
+        tag = Tag.objects.create(name='Sale')
+
+        for orders_count in [1, 20]:
+            for number in range(orders_count):
+                product = Product.objects.create(name=f'Product {orders_count} {number}', price=10, category=category)
+                product.tags.add(tag)
+                Order.objects.create_with_products(self.user, [(product, 1), (product, 2)])
+
+            # Session, user, orders, lines with products and categories, tags; no per-order queries
+            with self.assertNumQueries(5):
+                response = self.client.get('/api/orders/?count=none')
+            self.assertEqual(response.status_code, 200)
+
+        order = response.json()['results'][0]
+        self.assertEqual(order['order_products'][0]['product']['tags'], [{'name': 'Sale'}])
+
+    def create_order(self, products):
+        return self.client.post('/api/orders/', {
+            'order_products': [{'product': product.id, 'quantity': 2} for product in products],
+        }, content_type='application/json')
+
+    def test_create_query_budget(self):
+        self.client.force_login(self.user)
+
+        for lines_count in [1, 20]:
+            products = Product.objects.bulk_create([
+                Product(name=f'Product {lines_count} {number}', price=10) for number in range(lines_count)
+            ])
+
+            # Sales counters of never sold products take 8 queries (update, select, insert), later just 2.
+            # Order stats (orders, then lines) take 2: setUp's order created this hour's rows
+            with self.assertNumQueries(20):
+                response = self.create_order(products)
+
+            self.assertEqual(response.status_code, 201)
+            self.assertEqual(len(response.json()['order_products']), lines_count)
+
+        order = Order.objects.get(uuid=response.json()['uuid'])
+        self.assertEqual(order.total_price, 400)
+        self.assertEqual(order.order_products.count(), 20)
+
+    def test_create_unknown_product(self):
+        self.client.force_login(self.user)
+        response = self.client.post('/api/orders/', {
+            'order_products': [{'product': 0, 'quantity': 2}],
+        }, content_type='application/json')
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_superuser_date_range(self):
+        old_order = Order.objects.create(user=self.user)
+        Order.objects.filter(pk=old_order.pk).update(created_at=timezone.now() - timedelta(days=60))
+
+        self.client.force_login(User.objects.create(username='admin', is_superuser=True))
+
+        # Recent orders only by default
+        response = self.client.get('/api/orders/')
+        self.assertEqual([order['uuid'] for order in response.json()['results']], [str(self.order.uuid)])
+
+        since = (timezone.now() - timedelta(days=90)).date()
+        response = self.client.get(f'/api/orders/?created_after={since}')
+        self.assertEqual(response.json()['count'], 2)
+
+        # Still reachable directly
+        response = self.client.get(f'/api/orders/{old_order.uuid}/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_page_cache_size_limit(self):
+        self.client.force_login(self.user)
+
+        with mock.patch('orders.viewsets.ORDER_PAGE_CACHE_MAX_SIZE', 10), self.assertLogs('hillelDjango4.cache'):
+            self.client.get('/api/orders/')
+            # Too big to cache: built again
+            with self.assertNumQueries(6):
+                response = self.client.get('/api/orders/')
+        self.assertOrder(response)
+
+        self.client.get('/api/orders/')
+        with self.assertNumQueries(2):
+            self.client.get('/api/orders/')
@@ -0,0 +1,27 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from orders.models import Order
+from products.models import Product
+
+
+class GenerateOrdersTestCase(TestCase):
+    def test_bulk_generate(self):
+        Product.objects.bulk_create([Product(name='Coca-Cola', price=10), Product(name='Pepsi', price=20)])
+
+        call_command(
+            'generateorders', '--bulk', '--orders', '7', '--batch-size', '3', '--users', '2', '--days', '30',
+            '--skip-side-effects', stdout=StringIO(),
+        )
+
+        self.assertEqual(Order.objects.count(), 7)
+        # Spread over the days, not all created now
+        self.assertLess(Order.objects.earliest('created_at').created_at, timezone.now() - timedelta(hours=1))
+        self.assertTrue(Order._meta.get_field('created_at').auto_now_add)
+
+        # Orders created elsewhere still get their date
+        self.assertIsNotNone(Order.objects.create(user_id=Order.objects.first().user_id).created_at)
@@ -0,0 +1,176 @@
+from datetime import timedelta
+
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from orders.models import Order, OrderProduct, OrderStats, ReportExport
+from orders.reporter import report_order_stats, report_orders
+from orders.stats import get_order_totals, period_starts, rebuild_order_stats
+from products.models import Product
+
+
+class OrderTotalsTestCase(TestCase):
+    def setUp(self):
+        self.cola = Product.objects.create(name='Coca-Cola', price=10)
+        self.bread = Product.objects.create(name='Bread', price=5)
+        self.user = User.objects.create(username='vitalii', email='vitalii@example.com')
+        self.order = Order.objects.create(user=self.user)
+
+    def assertTotals(self, quantity, price):
+        order = Order.objects.with_totals().get(pk=self.order.pk)
+
+        self.assertEqual((order.total_quantity, order.total_price), (quantity, price))
+        self.assertEqual((order.computed_total_quantity, order.computed_total_price), (quantity, price))
+
+    def test_lines_change(self):
+        self.assertTotals(0, 0)
+
+        # One UPDATE of the order, the lines are not loaded back
+        with CaptureQueriesContext(connection) as queries:
+            line = OrderProduct.objects.create(order=self.order, product=self.cola, quantity=2)
+        order_queries = [query['sql'] for query in queries if 'orders_order"' in query['sql'].split('FROM')[0]]
+        self.assertEqual(len(order_queries), 1)
+        self.assertTrue(order_queries[0].startswith('UPDATE'))
+        OrderProduct.objects.create(order=self.order, product=self.bread, quantity=1)
+        self.assertTotals(3, 25)
+
+        line.quantity = 5
+        line.save()
+        self.assertTotals(6, 55)
+
+        line.delete()
+        self.assertTotals(1, 5)
+
+    def test_create_with_products(self):
+        self.order = Order.objects.create_with_products(self.user, [(self.cola, 2), (self.bread, 3)])
+        self.assertTotals(5, 35)
+
+    def test_report_appends_new_orders(self):
+        OrderProduct.objects.create(order=self.order, product=self.cola, quantity=2)
+        Order.objects.create_with_products(self.user, [(self.bread, 3)])
+
+        # First run after the migration: the sheet of the full-rewrite reporter is written again
+        with mock.patch('orders.reporter.write_to_sheet') as write_to_sheet, \
+                mock.patch('orders.reporter.clear_sheet') as clear_sheet:
+            report_orders()
+        self.assertTrue(clear_sheet.called)
+        self.assertEqual([row[1:4] for row in write_to_sheet.call_args.args[1]], [
+            ['vitalii@example.com', 20.0, 2.0],
+            ['vitalii@example.com', 15.0, 3.0],
+        ])
+
+        with mock.patch('orders.reporter.write_to_sheet') as write_to_sheet:
+            report_orders()
+            self.assertFalse(write_to_sheet.called)
+
+            order = Order.objects.create_with_products(self.user, [(self.cola, 1)])
+            # Export state, new orders with their users (no lines), then in two short savepoints around
+            # the Sheets call: the locked export state and the reserved rows, the claim check and the flags
+            with self.assertNumQueries(10):
+                report_orders()
+        self.assertEqual(write_to_sheet.call_args.args[0], 'A4:F4')
+        self.assertEqual([row[0] for row in write_to_sheet.call_args.args[1]], [str(order.uuid)])
+
+        # Created in the past (or committed late): behind the last order exported, still appended
+        backdated = Order.objects.create_with_products(self.user, [(self.bread, 1)])
+        Order.objects.filter(pk=backdated.pk).update(created_at=self.order.created_at - timedelta(days=1))
+        with mock.patch('orders.reporter.write_to_sheet') as write_to_sheet:
+            report_orders()
+        self.assertEqual([row[0] for row in write_to_sheet.call_args.args[1]], [str(backdated.uuid)])
+
+        with mock.patch('orders.reporter.write_to_sheet') as write_to_sheet, \
+                mock.patch('orders.reporter.clear_sheet') as clear_sheet, \
+                mock.patch('orders.reporter.REPORT_CHUNK_SIZE', 2):
+            report_orders(full=True)
+        self.assertTrue(clear_sheet.called)
+        self.assertEqual([len(call.args[1]) for call in write_to_sheet.call_args_list], [2, 2])
+        self.assertEqual(ReportExport.objects.get(name='orders').rows, 4)
+
+    def test_order_stats(self):
+        OrderProduct.objects.create(order=self.order, product=self.cola, quantity=2)
+        Order.objects.create_with_products(self.user, [(self.bread, 3)])
+
+        with mock.patch('orders.reporter.write_to_sheet') as write_to_sheet, self.assertNumQueries(1):
+            report_order_stats()
+        self.assertEqual(write_to_sheet.call_args.args[1], [
+            ['Total Orders', 2],
+            ['Total Products', 5.0],
+            ['Total Price', 35.0],
+        ])
+
+
+class OrderStatsTestCase(TestCase):
+    def setUp(self):
+        self.cola = Product.objects.create(name='Coca-Cola', price=10)
+        self.user = User.objects.create(username='vitalii')
+
+    def get_stats(self):
+        return {
+            (stats.period, stats.start): (stats.orders, stats.quantity, stats.revenue)
+            for stats in OrderStats.objects.all()
+        }
+
+    def test_incremental_matches_rebuild(self):
+        order = Order.objects.create_with_products(self.user, [(self.cola, 2)])
+        Order.objects.create_with_products(self.user, [(self.cola, 1)])
+
+        Order.objects.create_with_products(self.user, [(self.cola, 5)]).delete()
+
+        line = OrderProduct.objects.create(order=order, product=self.cola, quantity=4)
+        line.quantity = 3
+        line.save()
+        order.order_products.first().delete()
+
+        day = period_starts(order.created_at)[OrderStats.DAY]
+        self.assertEqual(get_order_totals(since=day), {'orders': 2, 'quantity': 4, 'revenue': 40})
+
+        incremental = self.get_stats()
+        rebuild_order_stats()
+        # Empty rows left after deletes are not rebuilt
+        self.assertEqual({key: values for key, values in incremental.items() if any(values)}, self.get_stats())
+
+    def test_cascade_delete(self):
+        order = Order.objects.create_with_products(self.user, [(self.cola, 1), (self.cola, 2), (self.cola, 3)])
+        Order.objects.create_with_products(self.user, [(self.cola, 4)])
+
+        # Per order: the lines totals and sales, one update of the stats and of each sales counter
+        with CaptureQueriesContext(connection) as queries:
+            order.delete()
+        self.assertFalse([query for query in queries if query['sql'].startswith('SELECT "orders_order"')])
+        self.assertEqual(len([query for query in queries if query['sql'].startswith('UPDATE')]), 3)
+
+        self.assertEqual(get_order_totals(), {'orders': 1, 'quantity': 4, 'revenue': 40})
+
+    def test_api(self):
+        Order.objects.create_with_products(self.user, [(self.cola, 2)])
+
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get('/api/orders/stats/').status_code, 403)
+
+        self.client.force_login(User.objects.create(username='admin', is_superuser=True))
+        # Session, user, totals, rows
+        with self.assertNumQueries(4):
+            response = self.client.get('/api/orders/stats/?period=hour')
+        self.assertEqual(response.json()['totals']['orders'], 1)
+        self.assertEqual([row['quantity'] for row in response.json()['rows']], ['2.000'])
+
+        self.assertEqual(self.client.get('/api/orders/stats/?period=week').status_code, 400)
+
+    def test_api_totals_follow_the_period(self):
+        noon = timezone.localtime().replace(hour=12, minute=0, second=0, microsecond=0)
+        order = Order.objects.create_with_products(self.user, [(self.cola, 2)])
+        Order.objects.filter(pk=order.pk).update(created_at=noon)
+        rebuild_order_stats()
+
+        self.client.force_login(User.objects.create(username='admin', is_superuser=True))
+        response = self.client.get('/api/orders/stats/', {
+            'period': 'hour', 'created_after': noon - timedelta(hours=12), 'created_before': noon,
+        })
+        # The day of the order starts in the range, its hour doesn't
+        self.assertEqual(response.json()['rows'], [])
+        self.assertEqual(response.json()['totals']['orders'], 0)
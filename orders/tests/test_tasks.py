@@ -0,0 +1,295 @@
+from datetime import timedelta
+from unittest import mock
+from uuid import UUID
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from hillelDjango4.cache import lock_key
+from hillelDjango4.celery import app
+from orders.models import Order, ReportExport
+from orders.reporter import (
+    append_orders, claim_report, finish_report_rebuild, plan_report_partitions, release_report, report_orders,
+    report_queryset, write_report_partition,
+)
+from orders.tasks import abort_orders_report_rebuild, rebuild_orders_report, update_orders_report
+from products.models import Product
+
+
+class CoalescedTaskTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.key = update_orders_report.coalesce_key((), {})
+        self.running_key = lock_key(update_orders_report.running_key())
+
+        patcher = mock.patch.object(update_orders_report, 'apply_async')
+        self.apply_async = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        patcher = mock.patch('orders.tasks.report_orders')
+        self.report_orders = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def run_task(self, task_id, **kwargs):
+        update_orders_report.push_request(id=task_id)
+        try:
+            update_orders_report(**kwargs)
+        finally:
+            update_orders_report.pop_request()
+
+    def test_burst_is_coalesced(self):
+        for _ in range(10):
+            update_orders_report.debounce()
+
+        self.assertEqual(self.apply_async.call_count, 1)
+        task_id = self.apply_async.call_args.kwargs['task_id']
+        self.assertEqual(self.apply_async.call_args.kwargs['countdown'], 5)
+
+        # Once the run starts, new calls queue the next one
+        self.run_task(task_id)
+        self.report_orders.assert_called_once_with(full=False)
+
+        update_orders_report.debounce()
+        self.assertEqual(self.apply_async.call_count, 2)
+
+        # Different arguments are a different run
+        update_orders_report.debounce(full=True)
+        self.assertEqual(self.apply_async.call_count, 3)
+
+    def test_one_run_at_a_time(self):
+        update_orders_report.debounce()
+        task_id = self.apply_async.call_args.kwargs['task_id']
+
+        cache.add(self.running_key, 'other-run')
+        self.run_task(task_id)
+
+        # Queued again, to run after the current one
+        self.assertFalse(self.report_orders.called)
+        self.assertEqual(self.apply_async.call_count, 2)
+        requeued_id = self.apply_async.call_args.kwargs['task_id']
+
+        # Still a single pending run
+        update_orders_report.debounce()
+        self.run_task('from-beat')
+        self.assertEqual(self.apply_async.call_count, 2)
+
+        cache.delete(self.running_key)
+        self.run_task(requeued_id)
+        self.assertTrue(self.report_orders.called)
+        self.assertIsNone(cache.get(self.running_key))
+
+    def test_lock_covers_every_argument(self):
+        # A full run and an incremental one write the same sheet
+        update_orders_report.debounce(full=True)
+        cache.add(self.running_key, 'other-run')
+        self.run_task(self.apply_async.call_args.kwargs['task_id'], full=True)
+
+        # Queued again with its own arguments
+        self.assertFalse(self.report_orders.called)
+        self.assertEqual(self.apply_async.call_count, 2)
+        self.assertEqual(self.apply_async.call_args.args, ((), {'full': True}))
+
+    def test_expired_lock_of_another_run_is_kept(self):
+        def run_past_timeout(full):
+            # The lock expired and the next run took it
+            cache.set(self.running_key, 'next-run')
+
+        self.report_orders.side_effect = run_past_timeout
+        self.run_task('from-beat')
+
+        self.assertTrue(self.report_orders.called)
+        self.assertEqual(cache.get(self.running_key), 'next-run')
+
+
+class RebuildOrdersReportTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        product = Product.objects.create(name='Coca-Cola', price=10)
+        user = User.objects.create(username='vitalii', email='vitalii@example.com')
+
+        now = timezone.now()
+        for days_ago, orders_count in [(10, 3), (5, 1), (4, 2), (0, 1)]:
+            for _ in range(orders_count):
+                order = Order.objects.create_with_products(user, [(product, 1)])
+                Order.objects.filter(pk=order.pk).update(created_at=now - timedelta(days=days_ago))
+
+        self.uuids = [str(uuid) for uuid in report_queryset().values_list('uuid', flat=True)]
+
+    def test_plan(self):
+        ranges = plan_report_partitions(3, timezone.now())
+
+        # Whole days: 3, then 1 + 2, then 1 orders
+        self.assertEqual([(first_row, count) for _, _, first_row, count in ranges], [(2, 3), (5, 3), (8, 1)])
+        self.assertEqual((ranges[0][0], ranges[-1][1]), (None, None))
+        self.assertEqual([since for since, _, _, _ in ranges[1:]], [until for _, until, _, _ in ranges[:-1]])
+        # Ranges start at the first order of their day
+        self.assertEqual([str(since[1]) for since, _, _, _ in ranges[1:]], [self.uuids[3], self.uuids[6]])
+
+    def run_eagerly(self):
+        # The chord runs in this process
+        app.conf.task_always_eager = True
+        self.addCleanup(setattr, app.conf, 'task_always_eager', False)
+
+    @mock.patch('orders.reporter.REPORT_CHUNK_SIZE', 2)
+    @mock.patch('orders.reporter.REBUILD_WRITE_CHUNKS', 1)
+    def test_rebuild(self):
+        self.run_eagerly()
+
+        with mock.patch('orders.reporter.clear_sheet'), \
+                mock.patch('orders.reporter.write_to_sheet') as write_to_sheet, \
+                mock.patch('orders.reporter.bulk_write_to_sheet') as bulk_write_to_sheet:
+            rebuild_orders_report(partitions=3)
+
+        rows = {}
+        for call in bulk_write_to_sheet.call_args_list:
+            # One chunk per batch update
+            (range_name, values), = call.args[1].items()
+            first_row, last_row = [int(cell[1:]) for cell in range_name.split(':')]
+            self.assertEqual(last_row - first_row + 1, len(values))
+            rows.update({first_row + index: row[0] for index, row in enumerate(values)})
+
+        self.assertEqual([rows[number] for number in sorted(rows)], self.uuids)
+        self.assertEqual(sorted(rows), list(range(2, 2 + len(self.uuids))))
+
+        export = ReportExport.objects.get(name='orders')
+        self.assertEqual((export.rows, str(export.last_uuid)), (len(self.uuids), self.uuids[-1]))
+        self.assertIsNone(export.rebuild_started_at)
+        self.assertFalse(Order.objects.filter(reported=False).exists())
+        # The incremental run after the rebuild had nothing to append
+        self.assertFalse(write_to_sheet.called)
+
+    def test_one_rewrite_at_a_time(self):
+        with mock.patch('orders.reporter.clear_sheet') as clear_sheet, \
+                mock.patch('orders.reporter.write_to_sheet') as write_to_sheet, \
+                mock.patch('orders.tasks.chord') as chord:
+            claim = claim_report()
+            self.assertIsNotNone(claim)
+
+            # Neither another rebuild nor a full run clears the sheet under it
+            self.assertIsNone(claim_report())
+            rebuild_orders_report()
+            report_orders(full=True)
+            self.assertEqual(clear_sheet.call_count, 1)
+            self.assertFalse(chord.called)
+
+            # An incremental run that started before the claim doesn't append into the rewritten sheet
+            self.assertFalse(append_orders(list(report_queryset()[:1])))
+            self.assertTrue(append_orders(list(report_queryset()[:1]), claim))
+            self.assertEqual(write_to_sheet.call_count, 1)
+        self.assertEqual(ReportExport.objects.get(name='orders').rebuild_started_at, claim)
+
+        self.assertTrue(release_report(claim))
+        self.assertFalse(release_report(claim))
+
+    def test_sheet_is_written_outside_the_lock(self):
+        ReportExport.objects.create(name='orders')
+        orders = list(report_queryset()[:2])
+
+        with mock.patch('orders.reporter.write_to_sheet', side_effect=Exception('Timeout')):
+            with self.assertRaises(Exception):
+                append_orders(orders)
+        # The reserved rows are given back
+        self.assertEqual(ReportExport.objects.get(name='orders').rows, 0)
+
+        # A rewrite starting during the Sheets call: it owns the report and writes these orders itself
+        with mock.patch('orders.reporter.clear_sheet'), \
+                mock.patch('orders.reporter.write_to_sheet', side_effect=lambda *args: claim_report()):
+            self.assertFalse(append_orders(orders))
+        export = ReportExport.objects.get(name='orders')
+        self.assertIsNotNone(export.rebuild_started_at)
+        self.assertFalse(Order.objects.filter(reported=True).exists())
+
+    def test_orders_deleted_since_planning(self):
+        with mock.patch('orders.reporter.clear_sheet'), mock.patch('orders.reporter.bulk_write_to_sheet'):
+            claim = claim_report()
+            ranges = plan_report_partitions(3, timezone.now())
+            Order.objects.filter(pk=self.uuids[0]).delete()
+
+            results = [write_report_partition(*partition, claim) for partition in ranges]
+
+        # Written at the planned rows, the next range isn't overwritten: a blank row is left
+        self.assertEqual([rows for rows, _, _ in results], [2, 3, 1])
+        self.assertFalse(finish_report_rebuild(results, claim, [count for _, _, _, count in ranges]))
+        self.assertIsNone(ReportExport.objects.get(name='orders').rebuild_started_at)
+
+    def test_pushed_out_orders_are_unmarked(self):
+        # Exported before the rebuild
+        Order.objects.update(reported=True)
+
+        with mock.patch('orders.reporter.clear_sheet'), mock.patch('orders.reporter.bulk_write_to_sheet'):
+            with CaptureQueriesContext(connection) as queries:
+                claim = claim_report()
+            # Not a write of every order
+            self.assertFalse([query for query in queries if query['sql'].startswith('UPDATE "orders_order"')])
+
+            ranges = plan_report_partitions(3, timezone.now())
+            # Committed late, in the first range
+            late = Order.objects.create(user=User.objects.get())
+            Order.objects.filter(pk=late.pk).update(created_at=timezone.now() - timedelta(days=11))
+
+            results = [write_report_partition(*partition, claim) for partition in ranges]
+
+        self.assertEqual([rows for rows, _, _ in results], [3, 3, 1])
+        # The last order of the first range no longer fits: left to the next incremental run
+        self.assertEqual(
+            set(Order.objects.filter(reported=False).values_list('uuid', flat=True)), {UUID(self.uuids[2])},
+        )
+
+    @mock.patch('orders.tasks.rebuild_orders_report.debounce')
+    @mock.patch('orders.tasks.update_orders_report.debounce')
+    def test_rebuild_with_deleted_orders_is_written_again(self, debounce, rebuild):
+        self.run_eagerly()
+
+        def plan_then_delete(partitions, until):
+            ranges = plan_report_partitions(partitions, until)
+            Order.objects.filter(pk=self.uuids[0]).delete()
+            return ranges
+
+        with mock.patch('orders.reporter.clear_sheet'), mock.patch('orders.reporter.bulk_write_to_sheet'), \
+                mock.patch('orders.tasks.plan_report_partitions', plan_then_delete):
+            rebuild_orders_report(partitions=3)
+
+        # Partitioned again
+        rebuild.assert_called_once_with(partitions=3, attempt=2)
+        debounce.assert_called_once_with()
+
+    @mock.patch('orders.reporter.REPORT_CHUNK_SIZE', 2)
+    @mock.patch('orders.reporter.REBUILD_WRITE_CHUNKS', 1)
+    def test_failed_write_is_retried(self):
+        self.run_eagerly()
+
+        failures = [Exception('Quota exceeded')] + [None] * 10
+        with mock.patch('orders.reporter.clear_sheet'), mock.patch('orders.reporter.write_to_sheet'), \
+                mock.patch('orders.reporter.bulk_write_to_sheet', side_effect=failures) as bulk_write_to_sheet:
+            rebuild_orders_report(partitions=3)
+
+        # 3 + 3 + 1 orders in chunks of 2, the first chunk twice
+        self.assertEqual(bulk_write_to_sheet.call_count, 6)
+        export = ReportExport.objects.get(name='orders')
+        self.assertEqual(export.rows, len(self.uuids))
+        self.assertIsNone(export.rebuild_started_at)
+
+    @mock.patch('orders.tasks.rebuild_orders_report.debounce')
+    @mock.patch('orders.tasks.update_orders_report.debounce')
+    def test_failed_rebuild_frees_the_report(self, debounce, rebuild):
+        with mock.patch('orders.reporter.clear_sheet'), mock.patch('orders.tasks.chord') as chord:
+            rebuild_orders_report(partitions=3)
+        claim = ReportExport.objects.get(name='orders').rebuild_started_at
+        self.assertIsNotNone(claim)
+
+        # What the chord runs when a partition fails for good
+        finish = chord.return_value.call_args.args[0]
+        error_handler, = finish.options['link_error']
+        self.assertEqual(error_handler.task, abort_orders_report_rebuild.name)
+        abort_orders_report_rebuild.apply(error_handler.args)
+
+        self.assertIsNone(ReportExport.objects.get(name='orders').rebuild_started_at)
+        rebuild.assert_called_once_with(partitions=3, attempt=2)
+
+        # Not forever
+        abort_orders_report_rebuild.apply((claim.isoformat(), 3, 3))
+        self.assertEqual(rebuild.call_count, 1)
@@ -1,36 +1,116 @@
-from django.core.cache import cache
+from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import PermissionDenied, ValidationError
 from rest_framework.response import Response
 
-from orders.models import Order
-from orders.serialializers import OrderSerializer
+from hillelDjango4.cache import get_or_compute
+from hillelDjango4.conditional import ConditionalGetMixin
+from hillelDjango4.prefetch import PrefetchPlanMixin
+from hillelDjango4.response_cache import normalize_query
+from orders.filtersets import OrderFilterSet, default_created_after
+from orders.models import Order, OrderStats, orders_cache_namespaces
+from orders.serialializers import OrderSerializer, OrderStatsSerializer
+from orders.stats import sum_stats
 
+# A page is 10 orders; anything bigger (huge orders) is served uncached rather than stored
+ORDER_PAGE_CACHE_MAX_SIZE = 256 * 1024
 
-class OrderViewSet(viewsets.ModelViewSet):
+
+class OrderViewSet(ConditionalGetMixin, PrefetchPlanMixin, viewsets.ModelViewSet):
     queryset = Order.objects.all()
     serializer_class = OrderSerializer
+    # Newest first, served by the (user, created_at, uuid) index
+    ordering = ['-created_at']
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = OrderFilterSet
 
     def get_queryset(self):
+        # Lines, products, categories and tags with a fixed number of queries (PrefetchPlanMixin)
+        queryset = super().get_queryset()
         user = self.request.user
 
         if user.is_superuser:
-            return self.queryset
+            return queryset
         else:
-            return self.queryset.filter(user=self.request.user)
+            return queryset.filter(user=self.request.user)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+
+        params = self.request.query_params
+        if (self.action == 'list' and self.request.user.is_superuser
+                and not any(params.get(name) for name in OrderFilterSet.base_filters)):
+            queryset = queryset.filter(created_at__gte=default_created_after())
+
+        return queryset
 
     def list(self, request, *args, **kwargs):
         user_id = request.user.id
-        cache_key = f'orders:{user_id}'
+        user_namespace, all_namespace = orders_cache_namespaces(user_id)
+        # 'orders' is bumped by product changes, since orders embed product data
+        namespace = all_namespace if request.user.is_superuser else user_namespace
+
+        # The superusers' default date range moves daily
+        window = default_created_after().date() if request.user.is_superuser else None
 
-        cached_data = cache.get(cache_key)
-        if cached_data:
-            return Response(cached_data)
+        not_modified = self.check_not_modified(request, 'orders', namespace, extra=window)
+        if not_modified:
+            return not_modified
 
-        queryset = self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True)
+        def build():
+            page = self.paginate_queryset(self.filter_queryset(self.get_queryset()))
+            serializer = self.get_serializer(page, many=True)
 
-        data = serializer.data
+            return self.get_paginated_response(serializer.data).data
 
-        cache.set(cache_key, data, timeout=60 * 60)
+        # One entry per page (cursor), count mode and date range.
+        # Users expect to see the order they just created: no stale pages after a bump
+        data = get_or_compute(
+            self.get_list_cache_key(request, window), build,
+            timeout=60 * 60, namespaces=['orders', namespace], stale_on_bump=False,
+            max_size=ORDER_PAGE_CACHE_MAX_SIZE,
+            # build() uses the request and the paginator: never refreshed after the response
+            background=False,
+        )
 
         return Response(data)
+
+    def get_list_cache_key(self, request, window=None):
+        query = normalize_query(
+            request.query_params,
+            allowed={'cursor', 'count', *OrderFilterSet.base_filters},
+            defaults={'count': 'estimate'},
+        )
+
+        return f'orders:{request.user.id}:{query}:{window}'
+
+    @action(detail=False, methods=['get'])
+    def stats(self, request):
+        """
+        Orders, quantity and revenue for superusers: ?period=day|hour&created_after=&created_before=
+        (the last 30 days by default), whole periods starting in the range.
+        Read from the rollups, never from the orders.
+        """
+        if not request.user.is_superuser:
+            raise PermissionDenied()
+
+        filterset = OrderFilterSet(request.query_params, queryset=Order.objects.none())
+        if not filterset.is_valid():
+            raise ValidationError(filterset.errors)
+        since = filterset.form.cleaned_data.get('created_after') or default_created_after()
+        until = filterset.form.cleaned_data.get('created_before')
+
+        period = request.query_params.get('period', OrderStats.DAY)
+        if period not in dict(OrderStats.PERIODS):
+            raise ValidationError({'period': f'One of {", ".join(dict(OrderStats.PERIODS))}'})
+
+        rows = OrderStats.objects.filter(period=period, start__gte=since).order_by('start')
+        if until is not None:
+            rows = rows.filter(start__lt=until)
+
+        return Response({
+            # The same rows: daily totals would count whole days around an hourly range
+            'totals': sum_stats(rows),
+            'rows': OrderStatsSerializer(rows, many=True).data,
+        })
@@ -1,18 +1,49 @@
 from django.contrib import admin
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.db import transaction
+from django.utils import timezone
 
-from products.models import Product, Category, Tag
+from hillelDjango4.pagination import EstimatedCountPaginator
+from products.models import Product, Category, Tag, invalidate_products
+from products.search import search_products
 
 # Register your models here.
 admin.site.register(Category)
 admin.site.register(Tag)
 
 
+class TagListFilter(admin.SimpleListFilter):
+    """Filter by tag with a subquery: no join over products_tags, so no DISTINCT over the products"""
+    title = 'tags'
+    parameter_name = 'tag'
+
+    def lookups(self, request, model_admin):
+        return Tag.objects.values_list('pk', 'name')
+
+    def queryset(self, request, queryset):
+        if not self.value():
+            return queryset
+
+        try:
+            tag_id = int(self.value())
+        except ValueError:
+            # The changelist redirects with ?e=1, like for other invalid lookups
+            raise IncorrectLookupParameters(f'Invalid tag id {self.value()!r}')
+
+        return queryset.filter(pk__in=Product.tags.through.objects.filter(tag_id=tag_id).values('product_id'))
+
+
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
     pass
     list_display = ['name', 'price', 'category']
-    list_filter = ['category', 'tags', 'created_at']
+    list_filter = ['category', TagListFilter, 'created_at']
     search_fields = ['name']
+    # Estimated counts above a threshold, and no second COUNT(*) of the whole table
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    # Unique index, also orders the autocomplete of OrderProductInline (search results by relevance)
+    ordering = ['name']
     # list_per_page = 10
     list_editable = ['price']
     list_display_links = ['name', 'category']
@@ -24,12 +55,61 @@ class ProductAdmin(admin.ModelAdmin):
     actions = ['make_18_plus', 'disable_18_plus']
 
     def make_18_plus(self, request, queryset):
-        queryset.update(is_18_plus=True)
+        self.update_products(queryset, is_18_plus=True)
 
     make_18_plus.short_description = 'Make 18+'
     make_18_plus.allowed_permissions = ('change',)
 
-    readonly_fields = ['created_at', 'updated_at']
+    def disable_18_plus(self, request, queryset):
+        self.update_products(queryset, is_18_plus=False)
+
+    disable_18_plus.short_description = 'Disable 18+'
+    disable_18_plus.allowed_permissions = ('change',)
+
+    @transaction.atomic
+    def update_products(self, queryset, **values):
+        # update() skips Product.save() and its signals: invalidate once for all the rows
+        products = list(queryset.values_list('pk', 'category_id'))
+        queryset.update(**values, updated_at=timezone.now())
+        invalidate_products([pk for pk, _ in products], [category_id for _, category_id in products])
+
+    @transaction.atomic
+    def delete_queryset(self, request, queryset):
+        # The deleted products don't bump the caches one by one (see clear_cache): once for all the rows
+        products = list(queryset.values_list('pk', 'category_id'))
+        queryset.delete()
+        invalidate_products([pk for pk, _ in products], [category_id for _, category_id in products])
+
+    def changelist_view(self, request, extra_context=None):
+        if request.method != 'POST' or '_save' not in request.POST:
+            return super().changelist_view(request, extra_context)
+
+        # list_editable: save_model() collects the edited rows, written with one bulk UPDATE
+        with transaction.atomic():
+            request.edited_products = []
+            response = super().changelist_view(request, extra_context)
+
+            if request.edited_products:
+                now = timezone.now()
+                for product in request.edited_products:
+                    product.updated_at = now
+                Product.objects.bulk_update(request.edited_products, [*self.list_editable, 'updated_at'])
+
+                invalidate_products(
+                    [product.pk for product in request.edited_products],
+                    [product.category_id for product in request.edited_products],
+                )
+
+        return response
+
+    def save_model(self, request, obj, form, change):
+        if change and getattr(request, 'edited_products', None) is not None:
+            request.edited_products.append(obj)
+            return
+
+        super().save_model(request, obj, form, change)
+
+    readonly_fields = ['created_at', 'updated_at', 'image_status']
     fieldsets = (
         (None, {
             'fields': ('name', 'price', 'description', 'is_18_plus')
@@ -38,7 +118,7 @@ class ProductAdmin(admin.ModelAdmin):
             'fields': ('category', 'tags')
         }),
         ('Images', {
-            'fields': ('image',)
+            'fields': ('image', 'image_status')
         }),
         ('Files', {
             'fields': ('manual',)
@@ -49,6 +129,13 @@ class ProductAdmin(admin.ModelAdmin):
     )
     filter_horizontal = ['tags']
 
+    def get_search_results(self, request, queryset, search_term):
+        # Indexed search (see products/search.py) instead of name ILIKE '%...%'
+        if not search_term.strip():
+            return queryset, False
+
+        return search_products(queryset, search_term), False
+
     def get_readonly_fields(self, request, obj=None):
         fields = self.readonly_fields.copy()
 
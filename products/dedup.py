@@ -0,0 +1,121 @@
+import random
+import re
+import unicodedata
+from collections import defaultdict
+from itertools import repeat
+from zlib import crc32
+
+NON_ALNUM_RE = re.compile(r'[^0-9a-z]+')
+DIGITS_RE = re.compile(r'\d+')
+
+
+def normalize_name(name):
+    # "Coca-Cola  Zéro" -> "coca cola zero"
+    name = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode().lower()
+    return NON_ALNUM_RE.sub(' ', name).strip()
+
+
+def shingles(text, size=3):
+    text = f' {text} '
+    return {text[i:i + size] for i in range(max(len(text) - size + 1, 1))}
+
+
+def jaccard(first, second):
+    return len(first & second) / len(first | second)
+
+
+class MinHashLSH:
+    """
+    MinHash signatures split into bands: names whose signatures agree on any band
+    share a bucket, and only those pairs are compared.
+    """
+
+    def __init__(self, num_perm=16, bands=4, seed=42):
+        # Each "permutation" is CRC32 started from a different random value, computed in C
+        generator = random.Random(seed)
+        self.seeds = [generator.getrandbits(32) for _ in range(num_perm)]
+        self.bands = bands
+        self.rows = num_perm // bands
+
+    def signature(self, shingle_set):
+        encoded = [shingle.encode() for shingle in shingle_set]
+
+        return [min(map(crc32, encoded, repeat(seed))) for seed in self.seeds]
+
+    def band_keys(self, shingle_set):
+        signature = self.signature(shingle_set)
+
+        return [
+            hash((band, *signature[band * self.rows:(band + 1) * self.rows]))
+            for band in range(self.bands)
+        ]
+
+
+class UnionFind:
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, item):
+        root = item
+        while self.parent.get(root, root) != root:
+            root = self.parent[root]
+
+        # Path compression
+        while item != root:
+            self.parent[item], item = root, self.parent.get(item, item)
+
+        return root
+
+    def union(self, first, second):
+        first, second = self.find(first), self.find(second)
+        if first != second:
+            # The smaller (older) id stays the root, it is the product that survives
+            self.parent[max(first, second)] = min(first, second)
+
+
+def find_duplicates(products, threshold=0.8, near=True):
+    """
+    products: iterable of (id, name) in id order.
+    Returns {duplicate_id: surviving_id}, the survivor being the oldest product of each group.
+
+    Exact duplicates share the normalized name. Near duplicates are blocked by the numbers
+    in the name (so "Chair 12" and "Chair 13" never match), bucketed by MinHash LSH and
+    confirmed by the Jaccard similarity of their character shingles.
+    """
+    groups = UnionFind()
+    first_by_name = {}
+    names = {}
+    buckets = defaultdict(list)
+    lsh = MinHashLSH()
+
+    for product_id, name in products:
+        normalized = normalize_name(name)
+
+        if normalized in first_by_name:
+            groups.union(first_by_name[normalized], product_id)
+            continue
+        first_by_name[normalized] = product_id
+
+        if not near:
+            continue
+
+        names[product_id] = normalized
+        product_shingles = shingles(normalized)
+        block = tuple(DIGITS_RE.findall(normalized))
+
+        compared = set()
+        for key in lsh.band_keys(product_shingles):
+            bucket = buckets[(block, key)]
+
+            for candidate_id in bucket:
+                if candidate_id not in compared:
+                    compared.add(candidate_id)
+                    if jaccard(product_shingles, shingles(names[candidate_id])) >= threshold:
+                        groups.union(candidate_id, product_id)
+            bucket.append(product_id)
+
+    return {
+        product_id: survivor_id
+        for product_id in groups.parent
+        if (survivor_id := groups.find(product_id)) != product_id
+    }
@@ -1,6 +1,13 @@
+from collections import defaultdict
+from functools import reduce
+from operator import or_
+
+from django.db.models import Case, Count, Q, Value, When
 from django_filters import FilterSet, CharFilter
+from rest_framework.filters import SearchFilter
 
-from products.models import Product
+from products.models import Product, Tag
+from products.search import search_products
 
 
 class ProductFilterSet(FilterSet):
@@ -20,24 +27,61 @@ class ProductFilterSet(FilterSet):
 
     category = CharFilter(field_name='category__name', lookup_expr='icontains')
     tag = CharFilter(field_name='tags__name', lookup_expr='icontains')
+    # tags=New,Sale returns products having all the tags, tags_any=New,Sale - at least one of them
     tags = CharFilter(method='filter_tags')
+    tags_any = CharFilter(method='filter_tags')
 
     def filter_tags(self, queryset, name, value):
-        tags = value.split(',')
+        tag_names = {tag.strip().lower() for tag in value.split(',') if tag.strip()}
+        if not tag_names:
+            return queryset
 
-        for tag in tags:
-            queryset = queryset.filter(tags__name__icontains=tag)
+        # Resolve names to ids once, instead of joining the tags table per requested tag
+        tag_ids = defaultdict(list)
+        for tag_id, tag_name in Tag.objects.filter(
+            reduce(or_, [Q(name__iexact=tag_name) for tag_name in tag_names])
+        ).values_list('id', 'name'):
+            tag_ids[tag_name.lower()].append(tag_id)
 
-        return queryset
+        product_tags = Product.tags.through.objects.filter(
+            tag_id__in=[tag_id for ids in tag_ids.values() for tag_id in ids]
+        )
+
+        if name == 'tags_any':
+            return queryset.filter(pk__in=product_tags.values('product_id'))
+
+        if len(tag_ids) < len(tag_names):
+            return queryset.none()
+
+        # One GROUP BY over the through table: count how many requested names each product has
+        matched_names = Count(
+            Case(*[When(tag_id__in=ids, then=Value(index)) for index, ids in enumerate(tag_ids.values())]),
+            distinct=True,
+        )
+        return queryset.filter(
+            pk__in=product_tags.values('product_id').annotate(
+                matched_names=matched_names
+            ).filter(matched_names=len(tag_names)).values('product_id')
+        )
+
+    # q=... full-text search over name, description, category and tags, ordered by relevance
+    q = CharFilter(method='filter_q', label='Query')
 
-    # q = CharFilter(method='filter_q', label='Query')
-    #
-    # def filter_q(self, queryset, name, value):
-    #     return (queryset.filter(name__icontains=value) |
-    #             queryset.filter(tags__name__icontains=value) |
-    #             queryset.filter(category__name__icontains=value) |
-    #             queryset.filter(description__icontains=value))
+    def filter_q(self, queryset, name, value):
+        return search_products(queryset, value)
 
     class Meta:
         model = Product
         fields = ['name', 'price', 'category', 'tag', 'is_18_plus']
+
+
+class ProductSearchFilter(SearchFilter):
+    """`search=` backed by the product search index instead of ILIKE '%...%' per field"""
+
+    def filter_queryset(self, request, queryset, view):
+        search_terms = self.get_search_terms(request)
+
+        if not search_terms:
+            return queryset
+
+        return search_products(queryset, ' '.join(search_terms))
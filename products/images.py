@@ -0,0 +1,58 @@
+from io import BytesIO
+
+from PIL import Image
+from django.conf import settings
+from django.core.files.base import ContentFile
+
+from products.models import Product
+
+
+def generate_variants(product: Product):
+    """Resize the original image into every PRODUCT_IMAGE_VARIANTS size and PRODUCT_IMAGE_FORMATS format"""
+    sizes = sorted(settings.PRODUCT_IMAGE_VARIANTS.items(), key=lambda item: item[1], reverse=True)
+    storage = product.image.storage
+
+    with product.image.open('rb') as file:
+        image = Image.open(file)
+        # JPEG only: let the decoder scale down by 1/2, 1/4 or 1/8 while decoding,
+        # instead of decoding the full-resolution upload
+        image.draft('RGB', sizes[0][1])
+        image = image.convert('RGB')
+
+    variants = {}
+    # Largest first, each smaller variant is resized from the previous one
+    for variant, size in sizes:
+        image.thumbnail(size)
+        variants[variant] = {}
+
+        for extension, image_format in settings.PRODUCT_IMAGE_FORMATS.items():
+            content = BytesIO()
+            image.save(content, format=image_format, quality=settings.PRODUCT_IMAGE_QUALITY)
+
+            name = f"products/variants/{product.pk}/{variant}.{extension}"
+            variants[variant][extension] = storage.save(name, ContentFile(content.getvalue()))
+
+    return variants
+
+
+def get_image_urls(product: Product):
+    return build_image_urls(product.image_status, product.image_variants)
+
+
+def build_image_urls(image_status, image_variants):
+    """{variant: {format: url}}, with the placeholder until the variants are ready"""
+    if image_status != Product.ImageStatus.READY:
+        return get_placeholder_urls()
+
+    storage = Product._meta.get_field('image').storage
+    return {
+        variant: {extension: storage.url(name) for extension, name in formats.items()}
+        for variant, formats in image_variants.items()
+    }
+
+
+def get_placeholder_urls():
+    return {
+        variant: {extension: settings.PRODUCT_IMAGE_PLACEHOLDER for extension in settings.PRODUCT_IMAGE_FORMATS}
+        for variant in settings.PRODUCT_IMAGE_VARIANTS
+    }
@@ -0,0 +1,76 @@
+from collections import defaultdict
+
+from products.emojis import get_category_emoji
+from products.images import build_image_urls, get_placeholder_urls
+from products.models import Category, Product, Tag
+from products.serializers import ProductSerializer
+
+# Columns needed to render ProductSerializer's output without model instances
+PRODUCT_LIST_VALUES = (
+    'id', 'name', 'price', 'is_18_plus', 'category_id', 'category__name', 'image_status', 'image_variants',
+)
+
+# display_name suffixes, in ProductSerializer.get_display_name order (the category emoji goes last)
+DISPLAY_NAME_RULES = (
+    (lambda row: row['is_18_plus'], ' 🔞'),
+    (lambda row: row['price'] < 100, ' 💰'),
+)
+
+
+def product_rows(queryset):
+    # select_related/prefetch_related are not needed for .values()
+    # Annotations (search rank) are kept, keyset pagination reads them from the rows
+    return queryset.select_related(None).prefetch_related(None).values(
+        *PRODUCT_LIST_VALUES, *queryset.query.annotations
+    )
+
+
+def serialize_product_rows(rows):
+    """
+    Same output as ProductSerializer(many=True).data, built from product_rows() dicts.
+
+    Tags come from one grouped query and category emojis are computed once per category,
+    instead of DRF building and running every field for every row.
+    """
+    rows = list(rows)
+    price_to_representation = ProductSerializer().fields['price'].to_representation
+
+    placeholder_urls = get_placeholder_urls()
+
+    # Same join as the tags prefetch, so tags come in the same order
+    tags = defaultdict(list)
+    for product_id, tag_name in Tag.objects.filter(
+        product__in=[row['id'] for row in rows]
+    ).values_list('product', 'name'):
+        tags[product_id].append({'name': tag_name})
+
+    categories = {row['category_id']: row['category__name'] for row in rows if row['category_id'] is not None}
+    category_emojis = {
+        category_id: get_category_emoji(Category(id=category_id, name=name))
+        for category_id, name in categories.items()
+    }
+
+    data = []
+    for row in rows:
+        display_name = row['name']
+        for rule, suffix in DISPLAY_NAME_RULES:
+            if rule(row):
+                display_name += suffix
+
+        category = None
+        if row['category_id'] is not None:
+            category = {'id': row['category_id'], 'name': row['category__name']}
+            display_name += ' ' + category_emojis[row['category_id']]
+
+        data.append({
+            'id': row['id'],
+            'name': row['name'],
+            'price': price_to_representation(row['price']),
+            'category': category,
+            'tags': tags[row['id']],
+            'display_name': display_name,
+            'images': (build_image_urls(row['image_status'], row['image_variants'])
+                       if row['image_status'] == Product.ImageStatus.READY else placeholder_urls),
+        })
+
+    return data
@@ -0,0 +1,47 @@
+from time import perf_counter
+
+from django.core.management import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from products.listing import product_rows, serialize_product_rows
+from products.models import Product
+from products.serializers import ProductSerializer
+
+
+class Command(BaseCommand):
+    help = 'Compare ProductSerializer with the .values() based list rendering (rows/second per page size)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-sizes', type=int, nargs='+', default=[10, 100, 1000])
+        parser.add_argument('--repeat', type=int, default=10)
+
+    def measure(self, render, repeat):
+        start = perf_counter()
+        for _ in range(repeat):
+            output = JSONRenderer().render(render())
+        return perf_counter() - start, output
+
+    def handle(self, *args, **options):
+        queryset = Product.objects.select_related('category').prefetch_related('tags').order_by('id')
+        repeat = options['repeat']
+
+        self.stdout.write(f"{'page size':>10} {'serializer rows/s':>18} {'values rows/s':>14} {'identical':>10}")
+
+        for page_size in options['page_sizes']:
+            page = queryset[:page_size]
+            rows_count = page.count()
+            if not rows_count:
+                self.stdout.write(self.style.WARNING('No products to render'))
+                return
+
+            serializer_time, serializer_json = self.measure(
+                lambda: ProductSerializer(page, many=True).data, repeat
+            )
+            values_time, values_json = self.measure(
+                lambda: serialize_product_rows(product_rows(page)), repeat
+            )
+
+            self.stdout.write(
+                f"{page_size:>10} {rows_count * repeat / serializer_time:>18.0f} "
+                f"{rows_count * repeat / values_time:>14.0f} {str(serializer_json == values_json):>10}"
+            )
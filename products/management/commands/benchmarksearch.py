@@ -0,0 +1,56 @@
+import random
+from time import perf_counter
+
+from django.core.management import BaseCommand
+from django.db.models import Q
+
+from products.models import Product
+from products.search import search_products, tokenize
+
+
+class Command(BaseCommand):
+    help = ('Compare the icontains product search with the search index. '
+            'Seed a large catalogue first, e.g. loadproducts with 1M products, then rebuildsearchindex.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queries', type=int, default=20, help='Number of random search terms')
+        parser.add_argument('--page-size', type=int, default=10)
+
+    def sample_terms(self, count):
+        # Random words taken from existing product names
+        last_pk = Product.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+        terms = []
+
+        while len(terms) < count and last_pk:
+            name = Product.objects.filter(pk__gte=random.randint(1, last_pk)).values_list('name', flat=True).first()
+            if name:
+                terms.append(random.choice(tokenize(name)))
+
+        return terms
+
+    def run(self, label, build_queryset, terms, page_size):
+        # What a list request does: COUNT(*) for the paginator + the first page
+        start = perf_counter()
+        for term in terms:
+            queryset = build_queryset(term)
+            queryset.count()
+            list(queryset[:page_size])
+        elapsed = perf_counter() - start
+
+        self.stdout.write(f"{label:<12} {elapsed / len(terms) * 1000:10.2f} ms/query")
+
+    def handle(self, *args, **options):
+        total = Product.objects.count()
+        terms = self.sample_terms(options['queries'])
+        if not terms:
+            self.stdout.write(self.style.WARNING('No products to search'))
+            return
+
+        self.stdout.write(f"{total} products, {len(terms)} queries, page size {options['page_size']}")
+
+        # Previous `search=` behaviour: search_fields = ['name', 'price']
+        self.run('icontains', lambda term: Product.objects.filter(
+            Q(name__icontains=term) | Q(price__icontains=term)
+        ).order_by('pk'), terms, options['page_size'])
+
+        self.run('index', lambda term: search_products(Product.objects.all(), term), terms, options['page_size'])
@@ -0,0 +1,24 @@
+from django.core.management import BaseCommand
+
+from hillelDjango4.response_cache import get_stats, reset_stats
+
+
+class Command(BaseCommand):
+    help = 'Response cache hit ratio per endpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Reset the counters after printing them')
+
+    def handle(self, *args, **options):
+        from hillelDjango4.urls import router
+
+        for prefix, viewset, basename in router.registry:
+            for action in getattr(viewset, 'response_cache_actions', ()):
+                endpoint = f'{basename}-{action}'
+                stats = get_stats(endpoint)
+
+                ratio = '-' if stats['ratio'] is None else f"{stats['ratio']:.1%}"
+                self.stdout.write(f"{endpoint}: {stats['hits']} hits, {stats['misses']} misses, hit ratio {ratio}")
+
+                if options['reset']:
+                    reset_stats(endpoint)
@@ -1,16 +1,85 @@
+from itertools import islice
+
 from django.core.management import BaseCommand
-import csv
+from django.db import transaction
+from django.db.models import Case, When, Value
+
+from hillelDjango4.cache import bump_version
+from orders.models import OrderProduct
+from products.dedup import find_duplicates
+from products.models import CATALOGUE_NAMESPACES, Product
+from products.sales import rebuild_sales
+from products.search import update_search_index
 
-from products.models import Product
+
+def chunked(items, size):
+    items = iter(items)
+    while chunk := list(islice(items, size)):
+        yield chunk
 
 
 class Command(BaseCommand):
+    help = 'Find products with the same (or with --near, nearly the same) name and merge them into the oldest one'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report the duplicates, change nothing')
+        # Fuzzy matches can be wrong: review them with --near --dry-run before merging
+        parser.add_argument('--near', action='store_true',
+                            help='Also merge near duplicates (similar names), not only equal normalized names')
+        parser.add_argument('--threshold', type=float, default=0.8,
+                            help='Name similarity (0..1) from which products count as near duplicates (--near)')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Duplicates merged per transaction')
+
     def handle(self, *args, **options):
-        # Read csv file
-        reader = csv.reader(open('duplicated_products.csv'))
+        # Stream (id, name) pairs, products are never loaded as model instances
+        products = Product.objects.order_by('id').values_list('id', 'name').iterator(chunk_size=10000)
+        duplicates = find_duplicates(products, threshold=options['threshold'], near=options['near'])
+
+        survivors_count = len(set(duplicates.values()))
+        self.stdout.write(f"Found {len(duplicates)} duplicates of {survivors_count} products")
+
+        if options['dry_run']:
+            names = dict(Product.objects.filter(
+                pk__in=[*list(duplicates)[:20], *list(duplicates.values())[:20]]
+            ).values_list('id', 'name'))
+            for duplicate_id, survivor_id in islice(duplicates.items(), 20):
+                self.stdout.write(
+                    f"  {names[duplicate_id]!r} ({duplicate_id}) -> {names[survivor_id]!r} ({survivor_id})"
+                )
+            return
+
+        merged = 0
+        for chunk in chunked(duplicates.items(), options['chunk_size']):
+            self.merge(dict(chunk))
+            merged += len(chunk)
+            self.stdout.write(f"Merged {merged}/{len(duplicates)} duplicates")
+
+        if duplicates:
+            # Tags were merged into the survivors
+            update_search_index(set(duplicates.values()))
+            bump_version(*CATALOGUE_NAMESPACES)
+
+        self.stdout.write(self.style.SUCCESS(f"Deleted {merged} duplicated products."))
+
+    @transaction.atomic
+    def merge(self, survivors):
+        """survivors: {duplicate_id: surviving_id}"""
+        survivor_ids = set(survivors.values())
+
+        # Order lines move to the surviving product, so deleting doesn't cascade to them
+        OrderProduct.objects.filter(product_id__in=survivors).update(product_id=Case(
+            *[When(product_id=duplicate_id, then=Value(survivor_id)) for duplicate_id, survivor_id in survivors.items()]
+        ))
+
+        ProductTag = Product.tags.through
+        ProductTag.objects.bulk_create([
+            ProductTag(product_id=survivors[product_id], tag_id=tag_id)
+            for product_id, tag_id in ProductTag.objects.filter(product_id__in=survivors).values_list(
+                'product_id', 'tag_id'
+            )
+        ], ignore_conflicts=True)
 
-        ids = []
-        for row in reader:
-            ids.append(int(row[0]))
+        # No dependent rows are left to collect: tags and sales counters are deleted in bulk
+        Product.objects.filter(pk__in=survivors).delete()
 
-        Product.objects.filter(id__in=ids).delete()
+        rebuild_sales(product_ids=survivor_ids)
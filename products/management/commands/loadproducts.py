@@ -1,18 +1,60 @@
+import multiprocessing
 import random
 from random import randint
 from django.core.management import BaseCommand
-from django.db import transaction
+from django.db import connection, connections, transaction
+from django.db.models import Max
 from faker import Faker
 
-from products.models import Category, Tag
+from hillelDjango4.cache import bump_version
+from products.models import CATALOGUE_NAMESPACES, Category, Product, Tag
+from products.search import make_search_document, update_search_vectors
+
+
+def load_products_batch(batch):
+    """Insert one batch of products with their tags, runs inside a worker process"""
+    start, count, words, categories, tags = batch
+
+    products = []
+    products_tags = []
+    for number in range(start, start + count):
+        # The number keeps names unique (Product.name is unique)
+        product_name = f"{random.choice(words)} {random.choice(words)} {number}".title()
+        category_id, category_name = random.choice(categories)
+        product_tags = random.sample(tags, randint(1, 3))  # Assign 1 to 3 random tags to each product
+
+        products.append(Product(
+            name=product_name,
+            price=randint(10, 100),
+            category_id=category_id,
+            search_document=make_search_document(product_name, category_name, [name for _, name in product_tags]),
+        ))
+        products_tags.append(product_tags)
+
+    ProductTag = Product.tags.through
+
+    with transaction.atomic():
+        # bulk_create() doesn't call save() or send signals: no image checks, no cache invalidation per row
+        products = Product.objects.bulk_create(products)
+        ProductTag.objects.bulk_create([
+            ProductTag(product_id=product.pk, tag_id=tag_id)
+            for product, product_tags in zip(products, products_tags)
+            for tag_id, _ in product_tags
+        ])
+        update_search_vectors(Product.objects.filter(pk__in=[product.pk for product in products]))
+
+    return count
 
 
 class Command(BaseCommand):
-    @transaction.atomic
-    def handle(self, *args, **options):
-        # Initialize Faker
-        fake = Faker()
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=10000, help='Number of products to create')
+        parser.add_argument('--bulk', action='store_true',
+                            help='Insert in batches with bulk_create, skipping per-product save() and signals')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Products per insert batch (--bulk)')
+        parser.add_argument('--workers', type=int, default=1, help='Parallel worker processes (--bulk)')
 
+    def handle(self, *args, **options):
         # Predefined categories
         categories = ['Electronics', 'Clothing', 'Books', 'Toys', 'Food', 'Tools', 'Sport', 'Other']
 
@@ -20,15 +62,6 @@ class Command(BaseCommand):
         for category in categories:
             Category.objects.get_or_create(name=category)
 
-        # Create product names using Faker
-        products = []
-        for _ in range(10000):
-            product_name = f"{fake.word()} {fake.word()}".title()  # Generate a two-word product name
-            category = Category.objects.order_by("?").first()  # Randomly select a category
-            price = randint(10, 100)
-
-            products.append(category.products.create(name=product_name, price=price))
-
         # Predefined tags
         tags_names = ['New', 'Sale', 'Top', 'Best', 'Cheap', 'Expensive', 'Exclusive', 'Limited']
 
@@ -38,10 +71,62 @@ class Command(BaseCommand):
             for tag_name in tags_names
         ]
 
+        if options['bulk']:
+            self.bulk_load(options['count'], options['batch_size'], options['workers'], tags)
+        else:
+            self.load(options['count'], tags)
+
+        self.stdout.write(self.style.SUCCESS(f"Successfully created {options['count']} products with random tags."))
+
+    @transaction.atomic
+    def load(self, count, tags):
+        # Initialize Faker
+        fake = Faker()
+
+        # Create product names using Faker
+        products = []
+        for _ in range(count):
+            product_name = f"{fake.word()} {fake.word()}".title()  # Generate a two-word product name
+            category = Category.objects.order_by("?").first()  # Randomly select a category
+            price = randint(10, 100)
+
+            products.append(category.products.create(name=product_name, price=price))
+
         # Assign random tags to products
         for product in products:
             random_tags = random.sample(tags, randint(1, 3))  # Assign 1 to 3 random tags to each product
             product.tags.add(*random_tags)
             product.save()
 
-        self.stdout.write(self.style.SUCCESS("Successfully created 1000 products with random tags."))
+    def bulk_load(self, count, batch_size, workers, tags):
+        fake = Faker()
+        # Pick words, categories and tags in memory instead of querying per product
+        words = [fake.word() for _ in range(1000)]
+        categories = list(Category.objects.values_list('id', 'name'))
+        tags = [(tag.id, tag.name) for tag in tags]
+
+        first_number = (Product.objects.aggregate(last_id=Max('id'))['last_id'] or 0) + 1
+        batches = [
+            (start, min(batch_size, first_number + count - start), words, categories, tags)
+            for start in range(first_number, first_number + count, batch_size)
+        ]
+
+        if connection.vendor == 'sqlite':
+            # SQLite allows a single writer
+            workers = 1
+
+        created = 0
+        if workers > 1:
+            # Forked workers must not share the parent's database connection
+            connections.close_all()
+            with multiprocessing.get_context('fork').Pool(workers) as pool:
+                for batch_count in pool.imap_unordered(load_products_batch, batches):
+                    created += batch_count
+                    self.stdout.write(f"Created {created}/{count} products")
+        else:
+            for batch in batches:
+                created += load_products_batch(batch)
+                self.stdout.write(f"Created {created}/{count} products")
+
+        # One invalidation for the whole load
+        bump_version(*CATALOGUE_NAMESPACES)
@@ -0,0 +1,23 @@
+from django.core.management import BaseCommand
+
+from products.models import Product
+from products.tasks import process_product_image
+
+
+class Command(BaseCommand):
+    help = 'Queue image variant generation for products whose variants are missing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Regenerate variants for every product with an image')
+
+    def handle(self, *args, **options):
+        products = Product.objects.exclude(image='').exclude(image__isnull=True)
+        if not options['all']:
+            products = products.exclude(image_status=Product.ImageStatus.READY)
+
+        queued = 0
+        for product_id in products.values_list('pk', flat=True).iterator():
+            process_product_image.delay(product_id)
+            queued += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Queued {queued} products for image processing."))
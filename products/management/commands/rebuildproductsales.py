@@ -0,0 +1,19 @@
+from django.core.management import BaseCommand
+
+from products.models import ProductSales, ProductDailySales
+from products.sales import rebuild_sales
+
+
+class Command(BaseCommand):
+    help = 'Rebuild product sales counters (used by popular products) from order lines'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        rebuild_sales(batch_size=options['batch_size'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt sales for {ProductSales.objects.count()} products "
+            f"({ProductDailySales.objects.count()} daily rows)."
+        ))
@@ -0,0 +1,33 @@
+from django.core.management import BaseCommand
+
+from products.models import Product
+from products.search import update_search_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild search documents (and PostgreSQL search vectors) for all products'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        total = Product.objects.count()
+        indexed = 0
+        last_pk = 0
+
+        # Walk the table by primary key, so every batch costs the same
+        while True:
+            product_ids = list(
+                Product.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size]
+            )
+            if not product_ids:
+                break
+
+            update_search_index(product_ids, batch_size=batch_size)
+            indexed += len(product_ids)
+            last_pk = product_ids[-1]
+
+            self.stdout.write(f"Indexed {indexed}/{total} products")
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt search index for {indexed} products."))
@@ -0,0 +1,55 @@
+# Generated by Django 5.0.7 on 2026-10-18 13:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0003_alter_product_category_alter_product_tags'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='image',
+            field=models.ImageField(blank=True, null=True, upload_to='products'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='manual',
+            field=models.FileField(blank=True, null=True, upload_to='manuals'),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='name',
+            field=models.CharField(max_length=255, unique=True),
+        ),
+        migrations.CreateModel(
+            name='ProductSales',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='sales', serialize=False, to='products.product')),
+                ('total_quantity', models.DecimalField(decimal_places=3, default=0, max_digits=14)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-total_quantity', 'product'], name='products_sales_top_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductDailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('quantity', models.DecimalField(decimal_places=3, default=0, max_digits=14)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='products.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date', 'product'], name='products_daily_sales_date_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='productdailysales',
+            constraint=models.UniqueConstraint(fields=('product', 'date'), name='products_daily_sales_unique'),
+        ),
+    ]
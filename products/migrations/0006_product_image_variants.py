@@ -0,0 +1,30 @@
+# Generated by Django 5.0.7 on 2026-10-18 13:33
+
+from django.db import migrations, models
+
+
+def mark_existing_images_pending(apps, schema_editor):
+    # Run `processproductimages` afterwards to generate their variants
+    Product = apps.get_model('products', 'Product')
+    Product.objects.exclude(image='').exclude(image__isnull=True).update(image_status='pending')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0005_product_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='image_status',
+            field=models.CharField(choices=[('none', 'No image'), ('pending', 'Pending'), ('processing', 'Processing'), ('ready', 'Ready'), ('failed', 'Failed')], default='none', editable=False, max_length=20),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.RunPython(mark_existing_images_pending, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+from django.db import migrations
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+
+
+def fill_sales(apps, schema_editor):
+    # Same as products.sales.rebuild_sales(), with the historical models: popular() reads only these tables
+    ProductSales = apps.get_model('products', 'ProductSales')
+    ProductDailySales = apps.get_model('products', 'ProductDailySales')
+    OrderProduct = apps.get_model('orders', 'OrderProduct')
+    batch_size = 5000
+
+    ProductSales.objects.all().delete()
+    ProductDailySales.objects.all().delete()
+
+    totals = OrderProduct.objects.values('product_id').annotate(quantity=Sum('quantity')).order_by()
+    ProductSales.objects.bulk_create(
+        (ProductSales(product_id=row['product_id'], total_quantity=row['quantity'])
+         for row in totals.iterator(chunk_size=batch_size)),
+        batch_size=batch_size,
+    )
+
+    days = OrderProduct.objects.values('product_id', date=TruncDate('order__created_at')).annotate(
+        quantity=Sum('quantity')
+    ).order_by()
+    ProductDailySales.objects.bulk_create(
+        (ProductDailySales(product_id=row['product_id'], date=row['date'], quantity=row['quantity'])
+         for row in days.iterator(chunk_size=batch_size)),
+        batch_size=batch_size,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0007_keyset_indexes'),
+        ('orders', '0003_remove_order_order_products_alter_orderproduct_order'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_sales, migrations.RunPython.noop),
+    ]
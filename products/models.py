@@ -1,15 +1,16 @@
-import os
-from io import BytesIO
-
-from PIL import Image
-from django.core.files.uploadedfile import SimpleUploadedFile
-from django.db import models
-from django.db.models import Manager, QuerySet, OuterRef, Sum, Subquery
-from django.db.models.functions import Coalesce
-from django.db.models.signals import post_save
+from datetime import timedelta
+
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models, transaction
+from django.db.models import Manager, QuerySet, Sum, F
+from django.db.models.signals import post_save, pre_save, post_delete, pre_delete, m2m_changed
 from django.dispatch import receiver
+from django.utils import timezone
 
-from orders.models import OrderProduct
+from hillelDjango4.cache import bump_version
+from hillelDjango4.tracking import ChangeTrackingMixin
+from orders.models import Order, OrderProduct, is_order_delete
+from orders.signals import order_products_created
 
 
 class Category(models.Model):
@@ -27,21 +28,30 @@ class Tag(models.Model):
 
 
 class ProductQuerySet(QuerySet):
-    def popular(self):
-        return self.annotate(
-            total_quantity=Coalesce(Sum('orderproduct__quantity'), 0, output_field=models.DecimalField())
-        ).order_by('-total_quantity')
+    def popular(self, days=None):
+        # Read the precomputed counters (see products/sales.py) instead of
+        # aggregating every order line on each call
+        if days:
+            since = timezone.localdate() - timedelta(days=days - 1)
+
+            return self.filter(daily_sales__date__gte=since).annotate(
+                total_quantity=Sum('daily_sales__quantity')
+            ).order_by('-total_quantity', 'pk')
+
+        return self.filter(sales__total_quantity__gt=0).annotate(
+            total_quantity=F('sales__total_quantity')
+        ).order_by('-total_quantity', 'pk')
 
 
 class ProductManager(Manager):
     def get_queryset(self):
         return ProductQuerySet(self.model, using=self._db)
 
-    def popular(self):
-        return self.get_queryset().popular()
+    def popular(self, days=None):
+        return self.get_queryset().popular(days)
 
 
-class Product(models.Model):
+class Product(ChangeTrackingMixin, models.Model):
     name = models.CharField(max_length=255, unique=True)
     price = models.DecimalField(max_digits=10, decimal_places=2)  # 99999999.99
     description = models.TextField(blank=True, null=True)
@@ -61,62 +71,252 @@ class Product(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class ImageStatus(models.TextChoices):
+        NONE = 'none', 'No image'
+        PENDING = 'pending', 'Pending'
+        PROCESSING = 'processing', 'Processing'
+        READY = 'ready', 'Ready'
+        FAILED = 'failed', 'Failed'
+
     image = models.ImageField(upload_to='products', null=True, blank=True)
+    image_status = models.CharField(max_length=20, choices=ImageStatus.choices, default=ImageStatus.NONE,
+                                    editable=False)
+    # {variant: {format: storage name}}, see PRODUCT_IMAGE_VARIANTS
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
 
     manual = models.FileField(upload_to='manuals', null=True, blank=True)
 
+    # Maintained by products/search.py: name, category, tags and description
+    search_document = models.TextField(blank=True, default='', editable=False)
+    # Weighted tsvector of search_document (PostgreSQL only, GIN-indexed in migrations)
+    search_vector = SearchVectorField(null=True, editable=False)
+
     objects = ProductManager()
 
+    class Meta:
+        indexes = [
+            # Keyset pagination by price (name is unique, id is the primary key)
+            models.Index(fields=['price', 'id'], name='products_price_id_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
-    def process_image(self):
-        image = Image.open(self.image)
-        image.thumbnail((200, 200))
+    def save(
+        self, force_insert=False, force_update=False, using=None, update_fields=None
+    ):
+        # Compared with the value loaded from the database, no extra SELECT
+        if not self.pk:
+            image_changed = bool(self.image)
+        else:
+            image_changed = self.has_changed('image')
 
-        _, thumb_extension = os.path.splitext(self.image.name)
+        # Variants are generated in the background (products/tasks.py), until then the API shows a placeholder
+        if image_changed:
+            self.image_status = self.ImageStatus.PENDING if self.image else self.ImageStatus.NONE
+            self.image_variants = {}
 
-        thumb_name = self.name
+        result = super().save(force_insert, force_update, using, update_fields)
 
-        thumb_filename = thumb_name + "_thumb" + ".jpg"
+        if image_changed and self.image:
+            from products.tasks import process_product_image
+            transaction.on_commit(lambda: process_product_image.delay(self.pk))
 
-        temp_thumb = BytesIO()
-        image.convert("RGB").save(temp_thumb, format='JPEG')
-        temp_thumb.seek(0)
+        return result
 
-        # set save=False, otherwise it will run in an infinite loop
-        self.image.save(thumb_filename,
-                        SimpleUploadedFile(
-                            thumb_filename,
-                            temp_thumb.read(),
-                            content_type=f"image/jpeg",
-                        ),
-                        save=False)
 
+# Response cache namespaces (see ProductViewSet): product:{id} - one product's data,
+# category:{id} - lists filtered by category, product_list - all other lists,
+# product_taxonomy - category and tag names, shown in every response and used by the filters
+PRODUCT_LIST_FIELDS = {'name', 'price', 'description', 'is_18_plus', 'category'}
+MAX_PRODUCT_NAMESPACES = 100
 
-    def save(
-        self, force_insert=False, force_update=False, using=None, update_fields=None
-    ):
-        # If image changed - process it
-        if not self.pk:
-            self.process_image()
-        else:
-            # Get current product
-            current_product = Product.objects.filter(pk=self.pk).first()
-            current_image = current_product.image if current_product else None
+# Everything cached about products, for bulk changes
+CATALOGUE_NAMESPACES = ('popular_products', 'products', 'orders', 'product_list', 'product_taxonomy')
+
+
+def product_cache_namespaces(product_ids, category_ids=()):
+    """Namespaces of the cached lists the products could have entered, left or moved in"""
+    product_ids = list(product_ids)
+    if len(product_ids) > MAX_PRODUCT_NAMESPACES:
+        # Cheaper to drop every cached product response than to bump thousands of counters
+        return ['product_list', 'product_taxonomy']
+
+    return [
+        'product_list',
+        *[f'product:{product_id}' for product_id in product_ids],
+        *[f'category:{category_id}' for category_id in set(category_ids) if category_id is not None],
+    ]
+
+
+def invalidate_products(product_ids, category_ids=()):
+    """One invalidation for changes made without Product.save(): bulk_update(), queryset.update()"""
+    bump_version('popular_products', 'products', 'orders', *product_cache_namespaces(product_ids, category_ids))
+
+
+@receiver([post_save, post_delete], sender=Product)
+def clear_cache(sender, instance, signal, created=False, origin=None, **kwargs):
+    if isinstance(origin, QuerySet) and origin.model is Product:
+        # Bulk deletes (ProductAdmin.delete_queryset(), deleteduplicates) invalidate once for all the rows
+        return
 
-            # If image changed - process it
-            if current_image.name != self.image.name:
-                self.process_image()
+    # O(1) invalidation: cached orders embed product data, so bump them too
+    namespaces = ['popular_products', 'products', 'orders']
 
-        return super().save(force_insert, force_update, using, update_fields)
+    # Lists are evicted only if the product could have entered, left or moved in them
+    if signal is post_delete or created or any(instance.has_changed(field) for field in PRODUCT_LIST_FIELDS):
+        category_ids = [instance.category_id, instance.previous_value('category')]
+        namespaces += product_cache_namespaces([instance.pk], category_ids)
+    else:
+        namespaces.append(f'product:{instance.pk}')
+
+    bump_version(*namespaces)
+
+
+SEARCHED_FIELDS = {'name', 'description', 'category', 'category_id'}
 
 
 @receiver(post_save, sender=Product)
-def clear_cache(sender, instance, **kwargs):
-    from django.core.cache import cache
-    cache.delete('popular_products')
+def update_product_search(sender, instance, update_fields, **kwargs):
+    # E.g. price-only edits don't change the search document
+    if update_fields is not None and not SEARCHED_FIELDS & set(update_fields):
+        return
+
+    from products.search import update_search_index
+    update_search_index([instance.pk])
+
+
+@receiver(m2m_changed, sender=Product.tags.through)
+def update_tagged_products_search(sender, instance, action, reverse, pk_set, **kwargs):
+    from products.search import update_search_index
+
+    if reverse and action == 'pre_clear':
+        # clear() doesn't pass pk_set, so remember the affected products
+        instance._cleared_product_ids = list(instance.product_set.values_list('pk', flat=True))
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        if not reverse:
+            product_ids = [instance.pk]
+        elif action == 'post_clear':
+            product_ids = instance._cleared_product_ids
+        else:
+            product_ids = pk_set
+
+        update_search_index(product_ids)
+
+        # Lists filtered by tags or search depend on product_list
+        bump_version(*product_cache_namespaces(product_ids))
+
+
+@receiver(post_save, sender=Category)
+def update_category_products_search(sender, instance, created, **kwargs):
+    if not created:
+        from products.search import update_search_index
+        update_search_index(instance.products.values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Tag)
+def update_tag_products_search(sender, instance, created, **kwargs):
+    if not created:
+        from products.search import update_search_index
+        update_search_index(instance.product_set.values_list('pk', flat=True))
+
+
+@receiver(pre_delete, sender=Tag)
+def remember_tag_products(sender, instance, **kwargs):
+    # The tagging rows are gone by post_delete (and no m2m_changed is sent for them)
+    instance._deleted_product_ids = list(instance.product_set.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Tag)
+def update_untagged_products_search(sender, instance, **kwargs):
+    from products.search import update_search_index
+    update_search_index(instance._deleted_product_ids)
+
+    bump_version(*product_cache_namespaces(instance._deleted_product_ids))
+
+
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=Tag)
+def clear_taxonomy_cache(sender, instance, **kwargs):
+    # Names are shown in every product response (orders and popular products included, and the list
+    # validators are built from 'products'), and filters by name may now match other categories/tags
+    bump_version(*CATALOGUE_NAMESPACES)
+
+
+class ProductSales(models.Model):
+    """Running total of sold quantity per product, maintained by products/sales.py"""
+    product = models.OneToOneField(Product, primary_key=True, on_delete=models.CASCADE, related_name='sales')
+    total_quantity = models.DecimalField(max_digits=14, decimal_places=3, default=0)
+
+    class Meta:
+        indexes = [
+            # Serves ProductQuerySet.popular() as an index scan + LIMIT
+            models.Index(fields=['-total_quantity', 'product'], name='products_sales_top_idx'),
+        ]
+
+
+class ProductDailySales(models.Model):
+    """Sold quantity per product per day (order date), for time-windowed popularity"""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='daily_sales')
+    date = models.DateField()
+    quantity = models.DecimalField(max_digits=14, decimal_places=3, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'date'], name='products_daily_sales_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['date', 'product'], name='products_daily_sales_date_idx'),
+        ]
+
+
+@receiver(order_products_created)
+def record_product_sales(sender, order_products, **kwargs):
+    from products.sales import record_sales
+    record_sales(order_products)
+
+
+@receiver(pre_save, sender=OrderProduct)
+def remember_sold_quantity(sender, instance: OrderProduct, **kwargs):
+    # Values as loaded from the database, so post_save can apply only the difference
+    instance._sold_before = None
+    if instance.pk and instance.is_tracked and (instance.has_changed('product') or instance.has_changed('quantity')):
+        instance._sold_before = instance.previous_value('product'), instance.previous_value('quantity')
+
+
+@receiver(post_save, sender=OrderProduct)
+def update_product_sales(sender, instance: OrderProduct, created, **kwargs):
+    sold_before = getattr(instance, '_sold_before', None)
+    if created or not sold_before:
+        return
+
+    from products.sales import increment_sales, sales_date
+    date = sales_date(instance)
+    product_id, quantity = sold_before
+    increment_sales([(product_id, date, -quantity), (instance.product_id, date, instance.quantity)])
+
+
+@receiver(post_delete, sender=OrderProduct)
+def revert_product_sales(sender, instance: OrderProduct, origin=None, **kwargs):
+    if is_order_delete(origin):
+        # Reverted per order by revert_order_sales
+        return
+
+    from products.sales import record_sales
+    record_sales([instance], sign=-1)
+
+
+@receiver(pre_delete, sender=Order)
+def collect_order_sales(sender, instance, **kwargs):
+    # Sold quantity per product, before the cascade deletes the lines
+    instance.deleted_sales = list(
+        instance.order_products.values('product_id').annotate(quantity=Sum('quantity')).order_by()
+        .values_list('product_id', 'quantity')
+    )
+
 
-    # Delete all orders cache
-    keys = cache.keys('orders:*')
-    cache.delete_many(keys)
+@receiver(post_delete, sender=Order)
+def revert_order_sales(sender, instance, **kwargs):
+    from products.sales import increment_sales, sales_date
+    date = sales_date(OrderProduct(order=instance))
+    increment_sales((product_id, date, -quantity) for product_id, quantity in instance.deleted_sales)
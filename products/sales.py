@@ -0,0 +1,76 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from hillelDjango4.counters import increment_many
+from orders.models import OrderProduct
+from products.models import ProductSales, ProductDailySales
+
+
+def sales_date(order_product: OrderProduct):
+    created_at = order_product.order.created_at
+
+    if timezone.is_naive(created_at):
+        return created_at.date()
+    return timezone.localdate(created_at)
+
+
+def record_sales(order_products, sign=1):
+    """Add (or with sign=-1 remove) the quantities of the given order lines to the counters"""
+    increment_sales(
+        (op.product_id, sales_date(op), sign * op.quantity)
+        for op in order_products
+    )
+
+
+def increment_sales(rows):
+    """Apply (product_id, date, quantity) deltas, grouped so each counter row is touched once"""
+    totals = defaultdict(int)
+    daily = defaultdict(int)
+
+    for product_id, date, quantity in rows:
+        totals[product_id] += quantity
+        daily[(product_id, date)] += quantity
+
+    increment_many(ProductSales, {
+        (('product_id', product_id),): {'total_quantity': quantity} for product_id, quantity in totals.items()
+    })
+    increment_many(ProductDailySales, {
+        (('product_id', product_id), ('date', date)): {'quantity': quantity}
+        for (product_id, date), quantity in daily.items()
+    })
+
+
+@transaction.atomic
+def rebuild_sales(product_ids=None, batch_size=5000):
+    """Recompute the counters from OrderProduct, for all products or just the given ones"""
+    sales = ProductSales.objects.all()
+    daily_sales = ProductDailySales.objects.all()
+    order_products = OrderProduct.objects.all()
+
+    if product_ids is not None:
+        sales = sales.filter(product_id__in=product_ids)
+        daily_sales = daily_sales.filter(product_id__in=product_ids)
+        order_products = order_products.filter(product_id__in=product_ids)
+
+    sales.delete()
+    daily_sales.delete()
+
+    totals = order_products.values('product_id').annotate(quantity=Sum('quantity')).order_by()
+    ProductSales.objects.bulk_create(
+        (ProductSales(product_id=row['product_id'], total_quantity=row['quantity'])
+         for row in totals.iterator(chunk_size=batch_size)),
+        batch_size=batch_size,
+    )
+
+    days = order_products.values('product_id', date=TruncDate('order__created_at')).annotate(
+        quantity=Sum('quantity')
+    ).order_by()
+    ProductDailySales.objects.bulk_create(
+        (ProductDailySales(product_id=row['product_id'], date=row['date'], quantity=row['quantity'])
+         for row in days.iterator(chunk_size=batch_size)),
+        batch_size=batch_size,
+    )
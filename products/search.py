@@ -0,0 +1,162 @@
+import re
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramSimilarity
+from django.db import connection
+from django.db.models import CharField, F, Q, Value
+from django.db.models.functions import Cast, Concat, StrIndex
+
+from hillelDjango4.cache import bump_version, get_version
+from products.models import Product
+
+SEARCH_CONFIG = 'simple'
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower())
+
+
+def build_search_documents(product_ids):
+    """Search text for each product: name, category, tags and description"""
+    products = Product.objects.filter(pk__in=product_ids).values_list(
+        'id', 'name', 'category__name', 'description'
+    )
+    tags = defaultdict(list)
+    for product_id, tag_name in Product.tags.through.objects.filter(
+        product_id__in=product_ids
+    ).values_list('product_id', 'tag__name'):
+        tags[product_id].append(tag_name)
+
+    return {
+        product_id: make_search_document(name, category, tags[product_id], description)
+        for product_id, name, category, description in products
+    }
+
+
+def update_search_index(product_ids, batch_size=1000):
+    product_ids = list(product_ids)
+
+    for start in range(0, len(product_ids), batch_size):
+        batch = product_ids[start:start + batch_size]
+        documents = build_search_documents(batch)
+
+        Product.objects.bulk_update(
+            [Product(pk=product_id, search_document=document) for product_id, document in documents.items()],
+            ['search_document'],
+        )
+        update_search_vectors(Product.objects.filter(pk__in=batch))
+
+    # Invalidates the in-process fallback index
+    bump_version('products')
+
+
+def update_search_vectors(queryset):
+    """Refresh search_vector from name and search_document (PostgreSQL only)"""
+    if connection.vendor != 'postgresql':
+        return
+
+    # Name matches rank above category/tag/description matches
+    queryset.update(
+        search_vector=(
+            SearchVector('name', weight='A', config=SEARCH_CONFIG) +
+            SearchVector('search_document', weight='B', config=SEARCH_CONFIG)
+        )
+    )
+
+
+def make_search_document(name, category=None, tags=(), description=None):
+    return ' '.join(part for part in [name, category, *tags, description] if part)
+
+
+def search_products(queryset, query):
+    """Filter queryset by a search query, ordered by relevance (annotated as `rank`)"""
+    if connection.vendor == 'postgresql':
+        search_query = SearchQuery(query, config=SEARCH_CONFIG, search_type='websearch')
+
+        # Full-text match (GIN on search_vector) or fuzzy name match (GIN trigram on name)
+        return queryset.annotate(
+            rank=SearchRank(F('search_vector'), search_query) + TrigramSimilarity('name', query)
+        ).filter(
+            Q(search_vector=search_query) | Q(name__trigram_similar=query)
+        ).order_by('-rank', 'pk')
+
+    product_ids = get_inverted_index().search(query)[:settings.SEARCH_FALLBACK_MAX_RESULTS]
+    if not product_ids:
+        return queryset.none()
+
+    # Rank by position in the index result: one INSTR() instead of a CASE branch per id
+    ranking = ',' + ','.join(map(str, product_ids)) + ','
+    position = StrIndex(Value(ranking), Concat(Value(','), Cast('pk', CharField()), Value(',')))
+
+    return queryset.filter(pk__in=product_ids).annotate(
+        rank=Value(len(ranking)) - position
+    ).order_by('-rank')
+
+
+class InvertedIndex:
+    """In-process token index over search documents, used when PostgreSQL isn't available"""
+    NAME_WEIGHT = 3
+
+    def __init__(self, documents):
+        # token -> {product_id: weighted term frequency}
+        self.postings = defaultdict(lambda: defaultdict(int))
+
+        for product_id, name, document in documents:
+            for token in tokenize(document):
+                self.postings[token][product_id] += 1
+            for token in tokenize(name):
+                self.postings[token][product_id] += self.NAME_WEIGHT - 1
+
+        self.tokens = sorted(self.postings)
+
+    def match(self, term):
+        # Every indexed token starting with the term, exact matches weigh double
+        scores = defaultdict(int)
+
+        position = bisect_left(self.tokens, term)
+        while position < len(self.tokens) and self.tokens[position].startswith(term):
+            token = self.tokens[position]
+            weight = 2 if token == term else 1
+
+            for product_id, frequency in self.postings[token].items():
+                scores[product_id] += weight * frequency
+            position += 1
+
+        return scores
+
+    def search(self, query):
+        scores = None
+
+        # All terms must match
+        for term in tokenize(query):
+            matches = self.match(term)
+            if scores is None:
+                scores = matches
+            else:
+                scores = {product_id: score + matches[product_id]
+                          for product_id, score in scores.items() if product_id in matches}
+
+            if not scores:
+                return []
+
+        return sorted(scores, key=lambda product_id: (-scores[product_id], product_id)) if scores else []
+
+
+_inverted_index = {'version': None, 'index': None}
+
+
+def get_inverted_index():
+    # Rebuilt lazily after any product change (products cache namespace bump)
+    version = get_version('products')
+
+    if _inverted_index['version'] != version:
+        _inverted_index['index'] = InvertedIndex(
+            Product.objects.values_list('id', 'name', 'search_document').iterator(chunk_size=10000)
+        )
+        _inverted_index['version'] = version
+
+    return _inverted_index['index']
@@ -1,6 +1,7 @@
 from rest_framework import serializers
 
 from products.emojis import get_category_emoji
+from products.images import get_image_urls
 from products.models import Product
 
 
@@ -21,6 +22,7 @@ class ProductSerializer(serializers.ModelSerializer):
     tags = TagSerializer(many=True)
 
     display_name = serializers.SerializerMethodField()
+    images = serializers.SerializerMethodField()
 
     def get_display_name(self, obj: Product):
         display_name = obj.name
@@ -36,6 +38,9 @@ class ProductSerializer(serializers.ModelSerializer):
 
         return display_name
 
+    def get_images(self, obj: Product):
+        return get_image_urls(obj)
+
     class Meta:
         model = Product
-        fields = ('id', 'name', 'price', 'category', 'tags', 'display_name')
+        fields = ('id', 'name', 'price', 'category', 'tags', 'display_name', 'images')
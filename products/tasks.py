@@ -0,0 +1,32 @@
+from hillelDjango4.cache import bump_version
+from hillelDjango4.celery import app
+from products.images import generate_variants
+from products.models import Product
+
+
+@app.task(bind=True, max_retries=3, default_retry_delay=30)
+def process_product_image(self, product_id):
+    product = Product.objects.filter(pk=product_id).first()
+    if not product or not product.image:
+        return
+
+    # Every status update is a no-op if the image was replaced meanwhile: its own task reports on it
+    image_name = product.image.name
+    processed = Product.objects.filter(pk=product_id, image=image_name)
+    processed.update(image_status=Product.ImageStatus.PROCESSING)
+
+    try:
+        variants = generate_variants(product)
+    except Exception as exc:
+        processed.update(image_status=Product.ImageStatus.FAILED)
+        raise self.retry(exc=exc)
+
+    # update() skips Product.save() and its signals
+    updated = processed.update(
+        image_status=Product.ImageStatus.READY,
+        image_variants=variants,
+    )
+    if updated:
+        bump_version('popular_products', 'products', 'orders', f'product:{product_id}')
+
+    return f"Product {product_id}: {len(variants)} image variants"
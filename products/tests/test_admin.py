@@ -0,0 +1,77 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+
+from products.models import Category, Product, Tag
+
+
+# Admin pages render static file URLs: local storages instead of S3 (no credentials in tests)
+@override_settings(STORAGES={
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+})
+class ProductAdminTestCase(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create(username='admin', is_staff=True, is_superuser=True))
+
+        category = Category.objects.create(name='Drinks')
+        self.sale = Tag.objects.create(name='Sale')
+        self.cola, self.pepsi = Product.objects.bulk_create([
+            Product(name='Coca-Cola', price=10, category=category),
+            Product(name='Pepsi', price=10, category=category),
+        ])
+        self.cola.tags.add(self.sale)
+
+    def test_changelist(self):
+        response = self.client.get('/admin/products/product/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['cl'].result_count, 2)
+        self.assertIsNone(response.context['cl'].full_result_count)
+
+    def test_tag_filter_and_search(self):
+        response = self.client.get(f'/admin/products/product/?tag={self.sale.pk}')
+        self.assertEqual(list(response.context['cl'].result_list), [self.cola])
+
+        response = self.client.get('/admin/products/product/?q=pepsi')
+        self.assertEqual(list(response.context['cl'].result_list), [self.pepsi])
+
+        response = self.client.get('/admin/products/product/?tag=abc')
+        self.assertRedirects(response, '/admin/products/product/?e=1')
+
+    def test_list_editable_bulk_update(self):
+        data = {
+            'form-TOTAL_FORMS': 2, 'form-INITIAL_FORMS': 2,
+            'form-0-id': self.pepsi.pk, 'form-0-price': '12.00',
+            'form-1-id': self.cola.pk, 'form-1-price': '15.00',
+            '_save': 'Save',
+        }
+        with mock.patch('products.admin.invalidate_products') as invalidate_products:
+            response = self.client.post('/admin/products/product/', data)
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Product.objects.get(pk=self.cola.pk).price, 15)
+        self.assertEqual(Product.objects.get(pk=self.pepsi.pk).price, 12)
+        invalidate_products.assert_called_once()
+
+    def test_actions(self):
+        data = {'action': 'make_18_plus', '_selected_action': [self.cola.pk]}
+        self.client.post('/admin/products/product/', data)
+        self.assertTrue(Product.objects.get(pk=self.cola.pk).is_18_plus)
+
+        data['action'] = 'disable_18_plus'
+        self.client.post('/admin/products/product/', data)
+        self.assertFalse(Product.objects.get(pk=self.cola.pk).is_18_plus)
+
+    def test_bulk_delete(self):
+        data = {'action': 'delete_selected', '_selected_action': [self.cola.pk, self.pepsi.pk], 'post': 'yes'}
+        with mock.patch('products.admin.invalidate_products') as invalidate_products, \
+                mock.patch('products.models.bump_version') as bump_version:
+            response = self.client.post('/admin/products/product/', data)
+
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(Product.objects.exists())
+        # Once for the batch, not per deleted product
+        invalidate_products.assert_called_once()
+        self.assertEqual(sorted(invalidate_products.call_args.args[0]), sorted([self.cola.pk, self.pepsi.pk]))
+        self.assertFalse(bump_version.called)
@@ -0,0 +1,74 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from hillelDjango4.cache import acquire_lock, bump_version, get_or_compute, lock_key, release_lock
+
+
+class GetOrComputeTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+    def compute(self):
+        self.calls += 1
+        return self.calls
+
+    def get(self, **kwargs):
+        return get_or_compute('test', self.compute, timeout=60, namespaces=['test'], **kwargs)
+
+    def test_cached_until_bump(self):
+        self.assertEqual(self.get(), 1)
+        self.assertEqual(self.get(), 1)
+
+        bump_version('test')
+        # Tests run in a transaction: the refresh happens inline
+        self.assertEqual(self.get(), 2)
+
+    def test_stale_while_another_worker_refreshes(self):
+        self.get()
+        bump_version('test')
+        cache.add(lock_key('test'), 1)
+
+        self.assertEqual(self.get(), 1)
+        self.assertEqual(self.calls, 1)
+
+        # Without stale values it waits for the lock holder, then computes itself
+        with mock.patch('hillelDjango4.cache.WAIT_TIMEOUT', 0.1):
+            self.assertEqual(self.get(stale_on_bump=False), 2)
+
+    def test_cold_miss_waits_for_the_lock_holder(self):
+        cache.add(lock_key('test'), 1)
+
+        with mock.patch('hillelDjango4.cache.WAIT_TIMEOUT', 0.1):
+            self.assertEqual(self.get(), 1)
+
+    def test_early_expiration(self):
+        self.get()
+
+        # A huge beta makes the refresh certain long before the entry expires
+        self.assertEqual(self.get(beta=10 ** 9), 2)
+        self.assertEqual(self.get(beta=0), 2)
+
+    def test_lock_release_checks_the_token(self):
+        token = acquire_lock('test')
+        self.assertIsNone(acquire_lock('test'))
+
+        # Expired and taken by another worker: not ours to release
+        cache.set(lock_key('test'), 'other')
+        release_lock('test', token)
+        self.assertEqual(cache.get(lock_key('test')), 'other')
+
+        release_lock('test', 'other')
+        self.assertIsNotNone(acquire_lock('test'))
+
+    def test_inline_refresh(self):
+        self.get()
+        bump_version('test')
+
+        with mock.patch('hillelDjango4.cache.connection') as connection, \
+                mock.patch('hillelDjango4.cache._compute_in_background') as compute_in_background:
+            connection.in_atomic_block = False
+            self.assertEqual(self.get(background=False), 2)
+        self.assertFalse(compute_in_background.called)
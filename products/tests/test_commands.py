@@ -0,0 +1,32 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from products.models import Category, Product, Tag
+
+
+class LoadProductsTestCase(TestCase):
+    def test_bulk_load(self):
+        Product.objects.create(name='Existing', price=10)
+
+        call_command('loadproducts', '--bulk', '--count', '7', '--batch-size', '3', '--workers', '1', stdout=StringIO())
+
+        products = Product.objects.exclude(name='Existing').prefetch_related('tags')
+        self.assertEqual(len(products), 7)
+        self.assertEqual(Category.objects.count(), 8)
+        self.assertEqual(Tag.objects.count(), 8)
+
+        for product in products:
+            self.assertTrue(1 <= len(product.tags.all()) <= 3)
+            self.assertIsNotNone(product.category_id)
+            # Numbered after the existing products: names stay unique
+            self.assertTrue(product.name.split()[-1].isdigit())
+            # Search document built in memory, with the category and tag names
+            for name in [product.category.name, *[tag.name for tag in product.tags.all()]]:
+                self.assertIn(name, product.search_document)
+
+        # Running it again adds products and reuses categories and tags
+        call_command('loadproducts', '--bulk', '--count', '2', '--workers', '1', stdout=StringIO())
+        self.assertEqual(Product.objects.count(), 10)
+        self.assertEqual(Category.objects.count(), 8)
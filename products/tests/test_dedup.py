@@ -0,0 +1,58 @@
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+
+from orders.models import Order, OrderProduct
+from products.dedup import find_duplicates
+from products.models import Product, ProductSales, Tag
+
+
+class FindDuplicatesTestCase(TestCase):
+    def test_exact_and_near_duplicates(self):
+        products = [
+            (1, 'Coca-Cola Zero'),
+            (2, 'Pepsi'),
+            (3, 'coca cola  zero'),
+            (4, 'Coca-Cola Zerro'),
+            (5, 'Chair 12'),
+            (6, 'Chair 13'),
+        ]
+
+        self.assertEqual(find_duplicates(products), {3: 1, 4: 1})
+        self.assertEqual(find_duplicates(products, near=False), {3: 1})
+
+
+class DeleteDuplicatesTestCase(TestCase):
+    def test_merges_into_oldest_product(self):
+        cola, copy = Product.objects.bulk_create([
+            Product(name='Coca-Cola', price=10),
+            Product(name='coca cola', price=12),
+        ])
+        copy.tags.add(Tag.objects.create(name='Sale'))
+        order = Order.objects.create(user=User.objects.create(username='vitalii'))
+        OrderProduct.objects.create(order=order, product=cola, quantity=1)
+        OrderProduct.objects.create(order=order, product=copy, quantity=2)
+
+        call_command('deleteduplicates', '--dry-run', stdout=StringIO())
+        self.assertTrue(Product.objects.filter(pk=copy.pk).exists())
+
+        call_command('deleteduplicates', stdout=StringIO())
+
+        self.assertEqual(list(Product.objects.all()), [cola])
+        self.assertEqual(OrderProduct.objects.filter(product=cola).count(), 2)
+        self.assertEqual([tag.name for tag in cola.tags.all()], ['Sale'])
+        self.assertEqual(ProductSales.objects.get(product=cola).total_quantity, 3)
+
+    def test_near_duplicates_are_opt_in(self):
+        Product.objects.bulk_create([
+            Product(name='Coca-Cola Zero', price=10),
+            Product(name='Coca-Cola Zerro', price=10),
+        ])
+
+        call_command('deleteduplicates', stdout=StringIO())
+        self.assertEqual(Product.objects.count(), 2)
+
+        call_command('deleteduplicates', '--near', stdout=StringIO())
+        self.assertEqual(Product.objects.count(), 1)
@@ -0,0 +1,35 @@
+from django.test import TestCase
+
+from products.filtersets import ProductFilterSet
+from products.models import Product, Tag
+
+
+class FilterTagsTestCase(TestCase):
+    def setUp(self):
+        new, sale, top = Tag.objects.bulk_create([Tag(name='New'), Tag(name='Sale'), Tag(name='Top')])
+        self.cola, self.pepsi, self.water = Product.objects.bulk_create([
+            Product(name='Coca-Cola', price=10),
+            Product(name='Pepsi', price=10),
+            Product(name='Water', price=10),
+        ])
+        self.cola.tags.add(new, sale)
+        self.pepsi.tags.add(sale, top)
+
+    def filter(self, **data):
+        return set(ProductFilterSet(data, queryset=Product.objects.all()).qs)
+
+    def test_all_tags(self):
+        self.assertEqual(self.filter(tags='new,Sale'), {self.cola})
+        self.assertEqual(self.filter(tags='Sale'), {self.cola, self.pepsi})
+        self.assertEqual(self.filter(tags='New,Top'), set())
+
+    def test_any_tags(self):
+        self.assertEqual(self.filter(tags_any='New,Top'), {self.cola, self.pepsi})
+
+    def test_unknown_tag(self):
+        self.assertEqual(self.filter(tags='Sale,Unknown'), set())
+        self.assertEqual(self.filter(tags_any='Sale,Unknown'), {self.cola, self.pepsi})
+
+    def test_query_count_does_not_grow_with_tags(self):
+        with self.assertNumQueries(2):
+            self.filter(tags='New,Sale,Top')
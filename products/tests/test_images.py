@@ -0,0 +1,76 @@
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+from PIL import Image
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+
+from products.models import Product
+from products.serializers import ProductSerializer
+from products.tasks import process_product_image
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def jpeg_upload(size=(1600, 1200)):
+    content = BytesIO()
+    Image.new('RGB', size, 'red').save(content, format='JPEG')
+
+    return SimpleUploadedFile('photo.jpg', content.getvalue(), content_type='image/jpeg')
+
+
+@override_settings(
+    STORAGES={
+        'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+        'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+    },
+    MEDIA_ROOT=MEDIA_ROOT,
+    PRODUCT_IMAGE_PLACEHOLDER='/placeholder.png',
+)
+class ProductImagesTestCase(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def test_no_image(self):
+        product = Product.objects.create(name='Test Product', price=100)
+
+        self.assertEqual(product.image_status, Product.ImageStatus.NONE)
+
+    def test_variants_are_generated_after_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            product = Product.objects.create(name='Test Product', price=100, image=jpeg_upload())
+
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(product.image_status, Product.ImageStatus.PENDING)
+        self.assertEqual(ProductSerializer(product).data['images']['thumb']['jpg'], '/placeholder.png')
+
+        process_product_image.apply(args=[product.pk])
+        product.refresh_from_db()
+
+        self.assertEqual(product.image_status, Product.ImageStatus.READY)
+        with product.image.storage.open(product.image_variants['medium']['webp']) as file:
+            self.assertEqual(Image.open(file).size, (600, 450))
+        self.assertTrue(ProductSerializer(product).data['images']['thumb']['jpg'].endswith('thumb.jpg'))
+
+    def test_failure_of_a_replaced_image(self):
+        with self.captureOnCommitCallbacks():
+            product = Product.objects.create(name='Test Product', price=100, image=jpeg_upload())
+
+        def replace_image(product):
+            # A new image is uploaded while the old one is processed, then the old one fails
+            Product.objects.filter(pk=product.pk).update(
+                image='products/new.jpg', image_status=Product.ImageStatus.PENDING,
+            )
+            raise OSError('Broken image')
+
+        with mock.patch('products.tasks.generate_variants', side_effect=replace_image), \
+                mock.patch.object(process_product_image, 'retry', side_effect=OSError):
+            process_product_image.apply(args=[product.pk])
+
+        product.refresh_from_db()
+        # Left for the task of the new image
+        self.assertEqual(product.image_status, Product.ImageStatus.PENDING)
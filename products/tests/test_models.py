@@ -0,0 +1,41 @@
+from django.test import TestCase
+
+from products.models import Category, Product
+
+
+class ProductChangeTrackingTestCase(TestCase):
+    def setUp(self):
+        Product.objects.create(name='Test Product', price=100, category=Category.objects.create(name='Food'))
+        self.product = Product.objects.get()
+
+    def test_changed_fields(self):
+        self.assertEqual(self.product.changed_fields, [])
+
+        self.product.price = 50
+        self.assertTrue(self.product.has_changed('price'))
+        self.assertFalse(self.product.has_changed('image'))
+        self.assertEqual(self.product.changed_fields, ['price'])
+        self.assertEqual(self.product.previous_value('price'), 100)
+
+    def test_save_writes_changed_fields_only(self):
+        self.product.price = 50
+
+        # Just the UPDATE: no image lookup, no search document refresh for a price change
+        with self.assertNumQueries(1) as context:
+            self.product.save()
+
+        self.assertNotIn('"name"', context.captured_queries[0]['sql'])
+        self.assertEqual(Product.objects.get().price, 50)
+        self.assertEqual(self.product.changed_fields, [])
+
+    def test_save_without_changes(self):
+        with self.assertNumQueries(0):
+            self.product.save()
+
+    def test_deferred_fields(self):
+        product = Product.objects.only('name').get()
+        product.name = 'Renamed'
+
+        self.assertEqual(product.changed_fields, ['name'])
+        self.assertEqual(product.price, 100)
+        self.assertFalse(product.has_changed('price'))
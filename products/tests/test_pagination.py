@@ -0,0 +1,77 @@
+from django.test import TestCase
+
+from products.models import Product, Tag
+
+
+class KeysetPaginationTestCase(TestCase):
+    def setUp(self):
+        # Few distinct prices, so pages split groups of equal prices
+        Product.objects.bulk_create([
+            Product(name=f'Product {number:02}', price=10 + number % 3) for number in range(25)
+        ])
+
+    def walk(self, url):
+        pages = []
+        while url:
+            data = self.client.get(url).json()
+            pages.append(data)
+            url = data['next']
+        return pages
+
+    def test_pages_follow_ordering(self):
+        for ordering, key in [
+            ('price', lambda product: (product.price, product.id)),
+            ('-price', lambda product: (-product.price, -product.id)),
+            ('-name', lambda product: tuple(-ord(char) for char in product.name)),
+            ('id', lambda product: product.id),
+        ]:
+            pages = self.walk(f'/api/products/?ordering={ordering}')
+
+            self.assertEqual([len(page['results']) for page in pages], [10, 10, 5])
+            self.assertEqual(
+                [product['id'] for page in pages for product in page['results']],
+                [product.id for product in sorted(Product.objects.all(), key=key)],
+            )
+            self.assertEqual(pages[0]['count'], 25)
+            self.assertIsNone(pages[0]['previous'])
+
+            # Back from the last page
+            previous = self.client.get(pages[-1]['previous']).json()
+            self.assertEqual(previous['results'], pages[1]['results'])
+            self.assertEqual(previous['next'], pages[1]['next'])
+
+    def test_count_modes(self):
+        self.assertEqual(self.client.get('/api/products/?count=exact').json()['count'], 25)
+        self.assertIsNone(self.client.get('/api/products/?count=none').json()['count'])
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get('/api/products/?cursor=nope').status_code, 404)
+
+    def test_search_rank_ordering(self):
+        pages = self.walk('/api/products/?search=product')
+
+        ids = [product['id'] for page in pages for product in page['results']]
+        self.assertEqual(sorted(ids), sorted(Product.objects.values_list('id', flat=True)))
+
+    def test_not_modified(self):
+        response = self.client.get('/api/products/')
+
+        response = self.client.get('/api/products/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get('/api/products/?ordering=price', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+
+        etag = self.client.get('/api/products/popular/')['ETag']
+        self.assertEqual(self.client.get('/api/products/popular/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        Product.objects.create(name='Pepsi', price=10)
+        self.assertEqual(self.client.get('/api/products/popular/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_taxonomy_change_is_modified(self):
+        tag = Tag.objects.create(name='Sale')
+        Product.objects.first().tags.add(tag)
+        etag = self.client.get('/api/products/')['ETag']
+
+        # Tag names are in the payload
+        tag.delete()
+        self.assertEqual(self.client.get('/api/products/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
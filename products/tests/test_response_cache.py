@@ -0,0 +1,116 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils.datastructures import MultiValueDict
+
+from hillelDjango4.cache import bump_version
+from hillelDjango4.response_cache import get_stats, normalize_query
+from products.viewsets import ProductViewSet
+from products.models import Category, Product, Tag
+
+
+class ResponseCacheTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+
+        self.drinks = Category.objects.create(name='Drinks')
+        self.food = Category.objects.create(name='Food')
+        self.cola = Product.objects.create(name='Coca-Cola', price=10, category=self.drinks)
+        self.bread = Product.objects.create(name='Bread', price=5, category=self.food)
+        self.sale = Tag.objects.create(name='Sale')
+        self.cola.tags.add(self.sale)
+
+    def test_normalize_query(self):
+        query = {'tags': ['Sale, New'], 'count': ['estimate'], 'name': [''], 'ordering': ['price'], 'foo': ['1']}
+
+        self.assertEqual(
+            normalize_query(MultiValueDict(query), allowed={'tags', 'count', 'name', 'ordering'},
+                            defaults={'count': 'estimate'}, lists=('tags',)),
+            'ordering=price&tags=new,sale',
+        )
+
+    def test_list_is_cached(self):
+        self.client.get('/api/products/?ordering=price')
+
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/products/?ordering=price&count=estimate')
+        self.assertEqual([product['id'] for product in response.json()['results']], [self.bread.id, self.cola.id])
+
+    def test_change_evicts_matching_lists_only(self):
+        self.client.get('/api/products/?category=drinks')
+        self.client.get('/api/products/?category=food')
+        self.client.get('/api/products/?tags=sale')
+
+        self.cola.price = 20
+        self.cola.save()
+
+        with self.assertNumQueries(0):
+            self.client.get('/api/products/?category=food')
+
+        response = self.client.get('/api/products/?category=drinks')
+        self.assertEqual(response.json()['results'][0]['price'], '20.00')
+        response = self.client.get('/api/products/?tags=sale')
+        self.assertEqual(response.json()['results'][0]['price'], '20.00')
+
+    def test_tags_change(self):
+        self.client.get('/api/products/?tags=sale')
+        self.bread.tags.add(self.sale)
+
+        response = self.client.get('/api/products/?tags=sale')
+        self.assertEqual(response.json()['count'], 2)
+
+    def test_retrieve(self):
+        self.client.get(f'/api/products/{self.cola.id}/')
+        with self.assertNumQueries(0):
+            self.client.get(f'/api/products/{self.cola.id}/')
+
+        self.drinks.name = 'Soft drinks'
+        self.drinks.save()
+        response = self.client.get(f'/api/products/{self.cola.id}/')
+        self.assertEqual(response.json()['category']['name'], 'Soft drinks')
+
+        self.assertEqual(self.client.get('/api/products/0/').status_code, 404)
+
+    def test_stats(self):
+        self.client.get('/api/products/')
+        self.client.get('/api/products/')
+
+        out = StringIO()
+        call_command('cachestats', stdout=out)
+        self.assertIn('product-list: 1 hits, 1 misses, hit ratio 50.0%', out.getvalue())
+
+    def test_bump_during_build_is_not_cached(self):
+        build_list = ProductViewSet.build_list
+
+        def build_and_change(viewset):
+            data = build_list(viewset)
+            # Changed after the rows were read
+            bump_version(f'product:{self.cola.id}')
+            return data
+
+        with mock.patch.object(ProductViewSet, 'build_list', build_and_change):
+            self.client.get('/api/products/')
+
+        # Built again, then cached
+        self.client.get('/api/products/')
+        self.client.get('/api/products/')
+        self.assertEqual(get_stats('product-list'), {'hits': 1, 'misses': 2, 'ratio': 1 / 3})
+
+    @override_settings(ALLOWED_HOSTS=['testserver', 'shop.example.com'])
+    def test_page_links_follow_the_request(self):
+        Product.objects.bulk_create([Product(name=f'Product {number}', price=1) for number in range(20)])
+
+        first = self.client.get('/api/products/?ordering=price&foo=1').json()
+        self.assertIn('foo=1', first['next'])
+
+        second = self.client.get('/api/products/?ordering=price', HTTP_HOST='shop.example.com').json()
+        self.assertEqual(second['results'], first['results'])
+        self.assertTrue(second['next'].startswith('http://shop.example.com/api/products/?'))
+        self.assertNotIn('foo=1', second['next'])
+
+        response = self.client.get(second['next'])
+        self.assertEqual(len(response.json()['results']), 10)
+        self.assertNotEqual(response.json()['results'], first['results'])
@@ -0,0 +1,54 @@
+from django.test import TestCase
+
+from products.models import Category, Product, Tag
+from products.search import InvertedIndex, search_products, update_search_index
+
+
+class InvertedIndexTestCase(TestCase):
+    def setUp(self):
+        self.index = InvertedIndex([
+            (1, 'Coca-Cola', 'Coca-Cola Drinks Sale'),
+            (2, 'Cola Zero', 'Cola Zero Drinks'),
+            (3, 'Chocolate', 'Chocolate Food Sale cola flavour'),
+        ])
+
+    def test_name_matches_rank_first(self):
+        self.assertEqual(self.index.search('cola'), [1, 2, 3])
+
+    def test_all_terms_must_match(self):
+        self.assertEqual(self.index.search('cola sale'), [1, 3])
+
+    def test_prefix(self):
+        self.assertEqual(self.index.search('choc'), [3])
+
+    def test_no_match(self):
+        self.assertEqual(self.index.search('pepsi'), [])
+
+
+class SearchProductsTestCase(TestCase):
+    def test_search_document_includes_relations(self):
+        drinks = Category.objects.create(name='Drinks')
+        product, _ = Product.objects.bulk_create([
+            Product(name='Coca-Cola', price=10, category=drinks),
+            Product(name='Bread', price=10),
+        ])
+        product.tags.add(Tag.objects.create(name='Sale'))
+        update_search_index(Product.objects.values_list('pk', flat=True))
+
+        product.refresh_from_db()
+        self.assertEqual(product.search_document, 'Coca-Cola Drinks Sale')
+
+        self.assertEqual(list(search_products(Product.objects.all(), 'drinks sale')), [product])
+        self.assertEqual(list(search_products(Product.objects.all(), 'milk')), [])
+
+    def test_deleted_tag_is_not_found(self):
+        product = Product.objects.create(name='Coca-Cola', price=10)
+        tag = Tag.objects.create(name='Sale')
+        product.tags.add(tag)
+        self.assertEqual(self.client.get('/api/products/?search=sale').json()['count'], 1)
+
+        tag.delete()
+
+        product.refresh_from_db()
+        self.assertEqual(product.search_document, 'Coca-Cola')
+        self.assertEqual(self.client.get('/api/products/?search=sale').json()['count'], 0)
@@ -1,8 +1,10 @@
 from unittest.mock import patch
 
 from django.test import TestCase
+from rest_framework.renderers import JSONRenderer
 
-from products.models import Product, Category
+from products.listing import product_rows, serialize_product_rows
+from products.models import Product, Category, Tag
 from products.serializers import ProductSerializer
 
 
@@ -40,3 +42,21 @@ class SerializersTestCase(TestCase):
         serializer = ProductSerializer(product)
 
         self.assertEqual(serializer.data['display_name'], 'Test Product 🔥')
+
+
+class ProductListingTestCase(TestCase):
+    def test_same_json_as_product_serializer(self):
+        food = Category.objects.create(name='Food')
+        drinks = Category.objects.create(name='Drinks')
+        sale, new = Tag.objects.create(name='Sale'), Tag.objects.create(name='New')
+
+        Product.objects.create(name='Plain', price=100)
+        Product.objects.create(name='Beer', price='99.5', is_18_plus=True, category=drinks).tags.add(sale, new)
+        Product.objects.create(name='Pizza', price=250, category=food).tags.add(new)
+
+        queryset = Product.objects.select_related('category').prefetch_related('tags').order_by('id')
+
+        self.assertEqual(
+            JSONRenderer().render(serialize_product_rows(product_rows(queryset))),
+            JSONRenderer().render(ProductSerializer(queryset, many=True).data),
+        )
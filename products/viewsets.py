@@ -1,28 +1,92 @@
-from django.core.cache import cache
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import viewsets
 from rest_framework.decorators import action
-from rest_framework.filters import SearchFilter, OrderingFilter
+from rest_framework.filters import OrderingFilter
 from rest_framework.response import Response
 
-from products.filtersets import ProductFilterSet
-from products.models import Product
+from hillelDjango4.cache import get_or_compute
+from hillelDjango4.conditional import ConditionalGetMixin
+from hillelDjango4.prefetch import PrefetchPlanMixin
+from hillelDjango4.response_cache import ResponseCacheMixin
+from products.filtersets import ProductFilterSet, ProductSearchFilter
+from products.listing import product_rows, serialize_product_rows
+from products.models import Category, Product
 from products.serializers import ProductSerializer
 from datetime import datetime
+import time
 
 
-class ProductViewSet(viewsets.ModelViewSet):
-    queryset = Product.objects.all().select_related('category').prefetch_related('tags')
+def build_popular():
+    # May run in a background refresh (see get_or_compute): doesn't use the request or the view
+    start = datetime.now()
+    rows = product_rows(Product.objects.popular())[:10]
+    data = serialize_product_rows(rows)
+    end = datetime.now()
+
+    print(f'Execution time: {(end - start).total_seconds()} seconds')
+
+    return data, time.time()
+
+
+class ProductViewSet(ConditionalGetMixin, ResponseCacheMixin, PrefetchPlanMixin, viewsets.ModelViewSet):
+    # category and tags are loaded by PrefetchPlanMixin, following ProductSerializer
+    queryset = Product.objects.all()
     serializer_class = ProductSerializer
     # GET, POST, PUT, PATCH, DELETE
 
     authentication_classes = []
     permission_classes = []
     filterset_class = ProductFilterSet
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
-    search_fields = ['name', 'price']
+    filter_backends = [DjangoFilterBackend, ProductSearchFilter, OrderingFilter]
+    # Indexed through Product.search_document (see products/search.py)
+    search_fields = ['name', 'description', 'category__name', 'tags__name']
     ordering_fields = ['name', 'price', 'id']
 
+    response_cache_actions = ('list', 'retrieve')
+    response_cache_params = {*ProductFilterSet.base_filters, 'search', 'ordering', 'cursor', 'count'}
+    response_cache_defaults = {'count': 'estimate'}
+    response_cache_lists = ('tags', 'tags_any')
+    tag_dependent_params = ('tag', 'tags', 'tags_any', 'q', 'search')
+
+    def list(self, request, *args, **kwargs):
+        not_modified = self.check_not_modified(request, 'products')
+        if not_modified:
+            return not_modified
+
+        return self.cached_response(request, self.build_list)
+
+    def build_list(self):
+        # Same JSON as ProductSerializer, rendered from .values() rows (see products/listing.py)
+        rows = product_rows(self.filter_queryset(self.get_queryset()))
+
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(serialize_product_rows(page)).data, self.get_list_cache_tags(page)
+
+        rows = list(rows)
+        return serialize_product_rows(rows), self.get_list_cache_tags(rows)
+
+    def get_list_cache_tags(self, rows):
+        """The products shown, and the lists a changed product could enter (see products/models.py)"""
+        params = self.request.query_params
+        tags = [f'product:{row["id"]}' for row in rows]
+
+        category = params.get('category', '').strip()
+        # Tag and search filters also match on tags, whose changes bump product_list
+        if not category or any(params.get(name, '').strip() for name in self.tag_dependent_params):
+            return [*tags, 'product_list']
+
+        # Filtered by category: only products of the matching categories can enter
+        category_ids = Category.objects.filter(name__icontains=category).values_list('pk', flat=True)
+        return [*tags, *[f'category:{pk}' for pk in category_ids], 'product_taxonomy']
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(request, self.build_retrieve)
+
+    def build_retrieve(self):
+        instance = self.get_object()
+        return self.get_serializer(instance).data, [f'product:{instance.pk}', 'product_taxonomy']
+
     @action(detail=False, methods=['get'])
     def popular(self, request):
         # popular_products = Product.objects.raw(
@@ -31,23 +95,17 @@ class ProductViewSet(viewsets.ModelViewSet):
         #
         # return Response(self.serializer_class(popular_products, many=True).data)
 
-        # Get from cache
+        # Get from cache, only one worker rebuilds it (see get_or_compute)
         start = datetime.now()
-        cached_data = cache.get('popular_products')
+        data, built_at = get_or_compute(
+            'popular_products', build_popular, timeout=60 * 60, namespaces=['popular_products']
+        )
         end = datetime.now()
-        if cached_data:
-            print(f'Cache execution time: {(end - start).total_seconds()} seconds')
-            return Response(cached_data)
-
-        start = datetime.now()
-        queryset = self.get_queryset().popular()[:10]
-        end = datetime.now()
-
-        print(f'Execution time: {(end - start).total_seconds()} seconds')
-
-        data = self.serializer_class(queryset, many=True).data
 
-        # Store in cache
-        cache.set('popular_products', data, timeout=60 * 60)
+        # The list is rebuilt when the cache entry expires, so its build time is part of the validators
+        not_modified = self.check_not_modified(request, 'popular_products', extra=built_at, modified_at=built_at)
+        if not_modified:
+            return not_modified
 
-        return Response(self.serializer_class(queryset, many=True).data)
+        print(f'Cache execution time: {(end - start).total_seconds()} seconds')
+        return Response(data)